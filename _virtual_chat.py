@@ -1,20 +1,23 @@
 # _virtual_chat.py
 import streamlit as st
-import cv2, time, os, tempfile, threading, datetime, glob, base64
+import cv2, time, threading, datetime, uuid
+import importlib.util
 import speech_recognition as sr
-from deepface import DeepFace
 from db import get_db
+from model_registry import get_registry
+from face_emotion import DetectionScheduler, EmotionSmoother
+from camera_capture import CameraCapture
+from session_recorder import SessionRecorder
+from face_tracker import FaceTracker
 
 import numpy as np
 
-DEEPFACE_AVAILABLE = True
-try:
-    import deepface
-except:
-    DEEPFACE_AVAILABLE = False
+# The face emotion model (DeepFace/TensorFlow) is loaded through the model registry
+DEEPFACE_AVAILABLE = importlib.util.find_spec("deepface") is not None
 
 # ==================== Virtual Chat Mode ====================
-def virtual_chat_mode(username=None, detect_text_emotion_func=None, retrieve_answer_func=None):
+def virtual_chat_mode(username=None, detect_text_emotion_func=None, retrieve_answer_func=None,
+                      save_message_func=None):
     if username is None:
         username = "Guest"
     
@@ -33,6 +36,14 @@ def virtual_chat_mode(username=None, detect_text_emotion_func=None, retrieve_ans
         return
 
     st.info("📸 Camera stays open! Chat freely with text or voice - bot speaks back!")
+    
+    registry = get_registry()
+    if registry.get_if_ready("face_emotion") is None:
+        face_error = registry.error("face_emotion")
+        if face_error:
+            st.warning(f"⚠️ Face emotion model could not be loaded ({face_error}): using text emotion only")
+        else:
+            st.caption("⏳ Face emotion model is warming up: using text emotion until it's ready")
 
     EMOJI_MAP = {
         "happy": "😄", "sad": "😢", "angry": "😠", "fear": "😨",
@@ -40,19 +51,37 @@ def virtual_chat_mode(username=None, detect_text_emotion_func=None, retrieve_ans
     }
 
     # ==================== SESSION STATE ====================
-    for key, val in {
-        "live_emotion": "neutral",
-        "live_confidence": 0.0,
-        "camera_active": False,
-        "frame_counter": 0,
-        "cap": None,
-        "virtual_chat_history": [],
-        "emotion_timeline": [],
-        "last_frame": None,
-        "detecting_emotion": False,  # Flag to prevent multiple detections
+    # Factories run only for missing keys, not on every rerun
+    for key, factory in {
+        "live_emotion": lambda: "neutral",
+        "live_confidence": lambda: 0.0,
+        "camera_active": lambda: False,
+        "camera": lambda: None,  # CameraCapture thread owning the device
+        "virtual_chat_history": list,
+        "session_recorder": lambda: None,  # Streams turns/emotion samples to MongoDB
+        "face_client_id": lambda: uuid.uuid4().hex,  # This session's key in the shared face pool
+        "face_scheduler": lambda: DetectionScheduler(target_hz=1.0, max_age=5.0),
+        "face_smoother": lambda: EmotionSmoother(window=5),
+        "face_tracker": lambda: FaceTracker(scale=0.25),  # Loads the Haar cascade
     }.items():
         if key not in st.session_state:
-            st.session_state[key] = val
+            st.session_state[key] = factory()
+
+    # A capture thread that stopped on its own (idle tab, lost device) ends the camera session
+    if st.session_state.camera_active and (st.session_state.camera is None or not st.session_state.camera.running):
+        st.session_state.camera_active = False
+        st.session_state.camera = None
+
+    # Turns and emotion samples are saved as they happen, in small batches
+    def get_recorder():
+        if st.session_state.session_recorder is None:
+            st.session_state.session_recorder = SessionRecorder(get_db(), username)
+        return st.session_state.session_recorder
+
+    try:
+        get_recorder().maybe_flush()
+    except Exception:
+        st.warning("⚠️ Could not connect to the database; this session won't be saved.")
 
     # ==================== TTS ====================
     try:
@@ -75,60 +104,112 @@ def virtual_chat_mode(username=None, detect_text_emotion_func=None, retrieve_ans
         threading.Thread(target=speak, daemon=True).start()
 
     # ==================== ASYNC EMOTION DETECTION ====================
-    def detect_emotion_async(frame_copy):
-        """Run emotion detection in background thread"""
-        if st.session_state.detecting_emotion:
-            return  # Skip if already detecting
+    # Frames go to the process-wide FaceEmotionPool; results are collected
+    # here in the script thread on the next rerun
+    def detect_emotion_async(frame):
+        """Queue the face in a frame for emotion detection (replaces any still waiting)"""
+        # Don't block on the model while it warms up; text emotion still works
+        pool = get_registry().get_if_ready("face_emotion")
+        if pool is None:
+            return
         
-        st.session_state.detecting_emotion = True
+        # The tracker finds the face cheaply; only that crop is copied and
+        # classified (the whole frame when no face is found)
+        face, _ = st.session_state.face_tracker.crop(frame)
+        h, w = face.shape[:2]
+        pool.submit(st.session_state.face_client_id, face.copy(), (0, 0, w, h))
+
+    def collect_emotion_result():
+        """Apply the newest finished detection for this session, if any"""
+        pool = get_registry().get_if_ready("face_emotion")
+        if pool is None:
+            return
+        result = pool.take_result(st.session_state.face_client_id)
+        if result is None:
+            return
+        
+        # Rolling average so a single odd frame doesn't flip the label
+        emotion, confidence = st.session_state.face_smoother.update(result["emotion"])
         
-        def detect():
-            tmp_path = None
+        # Update session state
+        st.session_state.live_emotion = emotion
+        st.session_state.live_confidence = confidence
+        
+        # Add to timeline
+        if st.session_state.session_recorder is not None:
+            st.session_state.session_recorder.add_sample(
+                emotion, confidence, datetime.datetime.utcfromtimestamp(result["finished_at"])
+            )
+
+    collect_emotion_result()
+
+    # ==================== LIVE FEED ====================
+    def render_emotion_metric(placeholder):
+        placeholder.metric(
+            "Your Current Emotion",
+            f"{EMOJI_MAP.get(st.session_state.live_emotion, '😐')} {st.session_state.live_emotion.title()}",
+            f"{st.session_state.live_confidence:.0%}"
+        )
+
+    def draw_emotion_overlay(frame):
+        # Draw emotion on frame with better visibility
+        emotion_text = f"{st.session_state.live_emotion.upper()}"
+        confidence_text = f"{st.session_state.live_confidence:.0%}"
+        
+        # Background rectangle for better readability
+        cv2.rectangle(frame, (5, 5), (300, 70), (0, 0, 0), -1)
+        cv2.rectangle(frame, (5, 5), (300, 70), (0, 255, 0), 2)
+        
+        # Emotion text
+        cv2.putText(frame, emotion_text, (15, 35), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+        
+        # Confidence text
+        cv2.putText(frame, confidence_text, (15, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+    def run_live_feed(video_placeholder, emotion_placeholder, display_fps=15):
+        """
+        Show new frames from the capture thread until the next rerun
+
+        Streamlit interrupts this loop when the user interacts with the page,
+        so it runs last, after the chat has been rendered.
+        """
+        camera = st.session_state.camera
+        display = None  # reused overlay buffer; the captured frame is never drawn on
+        last_seq = 0
+        
+        recorder = st.session_state.session_recorder
+        
+        while camera.running:
+            collect_emotion_result()
+            if recorder is not None:
+                recorder.maybe_flush()
+            seq, frame = camera.latest()
+            if frame is None or seq == last_seq:
+                time.sleep(0.01)
+                continue
+            last_seq = seq
+
+            # ==================== Emotion Detection (time budget + change detection) ====================
+            # At most once a second, and only when the scene changed or the result is stale
+            if st.session_state.face_scheduler.should_detect(frame):
+                detect_emotion_async(frame)
+
+            if display is None or display.shape != frame.shape:
+                display = np.empty_like(frame)
+            np.copyto(display, frame)
+            draw_emotion_overlay(display)
+            
+            # Display frame
             try:
-                # Save frame to temp file
-                tmp_path = os.path.join(tempfile.gettempdir(), f"emotion_{int(time.time()*1000)}.jpg")
-                cv2.imwrite(tmp_path, frame_copy)
-                
-                # Analyze emotion
-                result = DeepFace.analyze(
-                    img_path=tmp_path,
-                    actions=["emotion"],
-                    enforce_detection=False,
-                    detector_backend='opencv',
-                    silent=True
-                )
-                
-                if isinstance(result, list):
-                    result = result[0]
-                
-                emotion = result["dominant_emotion"]
-                confidence = result["emotion"][emotion] / 100.0
-                
-                # Update session state
-                st.session_state.live_emotion = emotion
-                st.session_state.live_confidence = confidence
-                
-                # Add to timeline
-                st.session_state.emotion_timeline.append({
-                    "timestamp": datetime.datetime.now().isoformat(),
-                    "emotion": emotion,
-                    "confidence": confidence
-                })
-                
-            except Exception as e:
-                # Silent fail - keep previous emotion
-                pass
-            finally:
-                # Cleanup
-                if tmp_path and os.path.exists(tmp_path):
-                    try:
-                        os.unlink(tmp_path)
-                    except:
-                        pass
-                st.session_state.detecting_emotion = False
+                # Try newer Streamlit API
+                video_placeholder.image(display, channels="BGR", use_container_width=True)
+            except TypeError:
+                # Fallback for older Streamlit versions
+                video_placeholder.image(display, channels="BGR")
+            render_emotion_metric(emotion_placeholder)
+            time.sleep(1.0 / display_fps)
         
-        # Run in background thread
-        threading.Thread(target=detect, daemon=True).start()
+        video_placeholder.error("❌ Cannot read from camera")
 
     # ==================== CRISIS KEYWORDS ====================
     CRISIS_KEYWORDS = ["suicide", "kill myself", "end my life", "i want to die", "harm myself"]
@@ -139,11 +220,8 @@ def virtual_chat_mode(username=None, detect_text_emotion_func=None, retrieve_ans
     # ==================== CAMERA ====================
     with col1:
         st.subheader("📹 Live Camera Feed")
-        st.metric(
-            "Your Current Emotion",
-            f"{EMOJI_MAP.get(st.session_state.live_emotion, '😐')} {st.session_state.live_emotion.title()}",
-            f"{st.session_state.live_confidence:.0%}"
-        )
+        emotion_placeholder = st.empty()
+        render_emotion_metric(emotion_placeholder)
 
         btn_col1, btn_col2, btn_col3 = st.columns(3)
         
@@ -152,19 +230,14 @@ def virtual_chat_mode(username=None, detect_text_emotion_func=None, retrieve_ans
                 if st.button("📷 Start Camera", use_container_width=True):
                     try:
                         # Release any existing camera
-                        if st.session_state.cap is not None:
-                            st.session_state.cap.release()
-                        
-                        # Open new camera
-                        st.session_state.cap = cv2.VideoCapture(0)
-                        st.session_state.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                        st.session_state.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-                        st.session_state.cap.set(cv2.CAP_PROP_FPS, 30)
-                        st.session_state.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+                        if st.session_state.camera is not None:
+                            st.session_state.camera.stop()
                         
-                        if st.session_state.cap.isOpened():
+                        # The capture thread owns the device from here on
+                        camera = CameraCapture(0, width=640, height=480, fps=30)
+                        if camera.start():
+                            st.session_state.camera = camera
                             st.session_state.camera_active = True
-                            st.session_state.frame_counter = 0
                             st.success("✅ Camera started!")
                         else:
                             st.error("❌ Failed to open camera")
@@ -174,87 +247,48 @@ def virtual_chat_mode(username=None, detect_text_emotion_func=None, retrieve_ans
             else:
                 if st.button("⏹ Stop Camera", use_container_width=True):
                     st.session_state.camera_active = False
-                    if st.session_state.cap:
-                        st.session_state.cap.release()
-                        st.session_state.cap = None
-                    save_session_to_mongo(username)
+                    pool = get_registry().get_if_ready("face_emotion")
+                    if pool is not None:
+                        pool.forget(st.session_state.face_client_id)
+                    st.session_state.face_smoother.reset()
+                    st.session_state.face_tracker.reset()
+                    if st.session_state.camera:
+                        st.session_state.camera.stop()
+                        st.session_state.camera = None
+                    save_session_to_mongo()
                     st.success("Camera stopped and session saved!")
                     st.rerun()
 
         with btn_col2:
             if st.button("📸 Snapshot", use_container_width=True, disabled=not st.session_state.camera_active):
-                if st.session_state.last_frame is not None:
-                    os.makedirs("snapshots", exist_ok=True)
-                    fname = f"snapshots/snap_{int(time.time())}.jpg"
-                    cv2.imwrite(fname, st.session_state.last_frame)
-                    st.success(f"📷 Saved!")
+                _, frame = st.session_state.camera.latest()
+                if frame is not None:
+                    try:
+                        get_recorder().add_snapshot(frame)
+                        st.success(f"📷 Saved!")
+                    except Exception:
+                        st.warning("⚠️ Could not save snapshot.")
         
         with btn_col3:
             if st.button("🔄 Detect Now", use_container_width=True, disabled=not st.session_state.camera_active):
-                if st.session_state.last_frame is not None and not st.session_state.detecting_emotion:
-                    detect_emotion_async(st.session_state.last_frame.copy())
+                _, frame = st.session_state.camera.latest()
+                if frame is not None:
+                    st.session_state.face_scheduler.mark(frame)
+                    detect_emotion_async(frame)
                     st.info("🔍 Detecting...")
 
         video_placeholder = st.empty()
 
-        # ==================== CAMERA LOOP ====================
-        if st.session_state.camera_active:
-            if st.session_state.cap is None or not st.session_state.cap.isOpened():
-                st.session_state.cap = cv2.VideoCapture(0)
-                st.session_state.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-                st.session_state.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        face_pool = get_registry().get_if_ready("face_emotion")
+        if face_pool is not None:
+            with st.expander("⚙️ Face inference load"):
+                st.json(face_pool.stats())
 
-            ret, frame = st.session_state.cap.read()
-            
-            if ret:
-                frame = cv2.flip(frame, 1)
-                st.session_state.last_frame = frame.copy()
-                st.session_state.frame_counter += 1
-
-                # ==================== Emotion Detection (every 60 frames = ~2 sec) ====================
-                # Run emotion detection less frequently to prevent hanging
-                if st.session_state.frame_counter % 60 == 0 and not st.session_state.detecting_emotion:
-                    detect_emotion_async(frame.copy())
-
-                # Draw emotion on frame with better visibility
-                emotion_text = f"{st.session_state.live_emotion.upper()}"
-                confidence_text = f"{st.session_state.live_confidence:.0%}"
-                
-                # Background rectangle for better readability
-                cv2.rectangle(frame, (5, 5), (300, 70), (0, 0, 0), -1)
-                cv2.rectangle(frame, (5, 5), (300, 70), (0, 255, 0), 2)
-                
-                # Emotion text
-                cv2.putText(
-                    frame,
-                    emotion_text,
-                    (15, 35),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.8,
-                    (0, 255, 0),
-                    2
-                )
-                
-                # Confidence text
-                cv2.putText(
-                    frame,
-                    confidence_text,
-                    (15, 60),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.6,
-                    (255, 255, 255),
-                    2
-                )
-                
-                # Display frame
-                try:
-                    # Try newer Streamlit API
-                    video_placeholder.image(frame, channels="BGR", use_container_width=True)
-                except TypeError:
-                    # Fallback for older Streamlit versions
-                    video_placeholder.image(frame, channels="BGR")
-            else:
-                video_placeholder.error("❌ Cannot read from camera")
+        recorder = st.session_state.session_recorder
+        if recorder is not None and recorder.snapshot_count:
+            with st.expander(f"🖼️ This session's snapshots ({recorder.snapshot_count})"):
+                refs = recorder.snapshots.list(username, recorder.session_id, limit=12)
+                st.image([bytes(ref["thumbnail"]) for ref in refs], width=120)
 
     # ==================== CHAT ====================
     with col2:
@@ -327,42 +361,45 @@ def virtual_chat_mode(username=None, detect_text_emotion_func=None, retrieve_ans
             "role": "assistant",
             "content": bot_reply
         })
+        if st.session_state.session_recorder is not None:
+            st.session_state.session_recorder.add_turn("user", user_input, final_emotion)
+            st.session_state.session_recorder.add_turn("assistant", bot_reply)
+
+        # Counted with the text chats in analytics, with the face reading
+        # when the camera has produced one
+        if save_message_func is not None:
+            has_face = face_confidence > 0
+            try:
+                save_message_func(
+                    username, user_input, bot_reply, text_emotion, final_emotion,
+                    face_emotion if has_face else None, face_confidence if has_face else None
+                )
+            except Exception as e:
+                print(f"⚠️ Could not save virtual chat message: {e}")
 
         # Speak the reply
         speak_async(bot_reply)
         
         st.rerun()
 
+    # ==================== CAMERA LOOP ====================
+    if st.session_state.camera_active:
+        run_live_feed(video_placeholder, emotion_placeholder)
+
 # ==================== SAVE TO MONGODB ====================
-def save_session_to_mongo(username: str):
-    try:
-        db = get_db()
-        col = db["virtual_chat_sessions"]
+def save_session_to_mongo():
+    """
+    End the current session: flush the last buffered turns and samples
+
+    Everything else was already appended while the session ran (see
+    session_recorder.SessionRecorder).
+    """
+    recorder = st.session_state.get("session_recorder")
+    if recorder is None:
+        return
 
-        # Read all snapshots
-        snapshot_data = []
-        if os.path.exists("snapshots"):
-            for f in glob.glob("snapshots/*.jpg"):
-                try:
-                    with open(f, "rb") as img_file:
-                        snapshot_data.append(
-                            base64.b64encode(img_file.read()).decode("utf-8")
-                        )
-                except Exception:
-                    pass
-
-        doc = {
-            "username": username,
-            "timestamp": datetime.datetime.utcnow(),
-            "chat_history": st.session_state.virtual_chat_history,
-            "emotion_timeline": st.session_state.emotion_timeline,
-            "snapshots": snapshot_data,
-            "total_messages": len(st.session_state.virtual_chat_history),
-            "session_duration_emotions": len(st.session_state.emotion_timeline),
-        }
-
-        col.insert_one(doc)
+    if recorder.close():
         st.success("✅ Virtual Chat Session saved to MongoDB")
-
-    except Exception as e:
+    else:
         st.warning("⚠️ Could not save session to database.")
+    st.session_state.session_recorder = None
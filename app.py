@@ -1,29 +1,26 @@
+import time
+_IMPORT_START = time.perf_counter()
+
 import streamlit as st
-import json, os, faiss, bcrypt, datetime
-import numpy as np
+import json, os, bcrypt, datetime
+import importlib.util
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import cv2
-import pyttsx3
-import threading
-import tempfile
-from PIL import Image
-import speech_recognition as sr
-from sentence_transformers import SentenceTransformer
-from transformers import pipeline
-import time
-import os,datetime
-  #  import speech_recognition as sr
-from deepface import DeepFace
+from zoneinfo import available_timezones
+# Heavy stacks (TensorFlow/DeepFace, OpenCV, transformers, sentence-transformers,
+# speech, TTS) are imported lazily by model_registry and the pages that need them
 # the two phases are imported here 
 import phase2_enhancements as phase2
 import phase3_intervention as phase3
 
-from _virtual_chat import virtual_chat_mode
-from _virtual_chat import virtual_chat_mode, save_session_to_mongo
-from enhanced_rag_system import EnhancedRAGSystem, get_enhanced_response
-from chatbot_reponses import get_response, detect_emotion_from_text
+from chatbot_reponses import get_response, detect_basic_emotion, KEYWORD_MAPPINGS, RESPONSES_VERSION
+from cache_utils import ResponseMemo
+from pymongo.errors import DuplicateKeyError
+from model_registry import get_registry
+from repositories import repository, transfer_report
+import daily_stats
+import streaks
 # ==================== ENHANCED REMINDER SYSTEM ====================
 # Add this code to your main app (after your imports and before main())
 
@@ -38,6 +35,16 @@ st.set_page_config(
     layout="wide"
 )
 
+# ==================== Warm-up / Health ====================
+# First call per process starts loading the models on background threads
+registry = get_registry()
+
+# Opening the app with ?health in a browser shows the readiness summary.
+# Probes can't use it (plain HTTP only gets the static page): use health.py
+if "health" in st.query_params:
+    st.json(registry.health())
+    st.stop()
+
 # ==================== Database ====================
 db = get_db()
 
@@ -260,84 +267,57 @@ ASSESSMENT_QUESTIONS = {
 }
 
 # ==================== DeepFace Check ====================
-try:
-    from deepface import DeepFace
-    DEEPFACE_AVAILABLE = True
-except ImportError:
-    DEEPFACE_AVAILABLE = False
+# find_spec checks installation without importing TensorFlow
+DEEPFACE_AVAILABLE = importlib.util.find_spec("deepface") is not None
 
 # ==================== Database / RAG ====================
-    
-@st.cache_resource
+# Models are preloaded in the background (see model_registry.MINDSYNC_WARMUP);
+# until they are ready, pages answer in keyword-only mode instead of blocking
+registry.record("app imports", time.perf_counter() - _IMPORT_START)
+
 def load_emotion_model():
-    return pipeline("text-classification", model="j-hartmann/emotion-english-distilroberta-base", return_all_scores=True)
+    """Emotion classifier if warmed up, else None"""
+    return registry.get_if_ready("emotion_classifier")
 
-@st.cache_resource
 def init_enhanced_rag():
-    return EnhancedRAGSystem(rag_directory="rag_knowledges")
+    """RAG system if warmed up, else None"""
+    return registry.get_if_ready("rag")
 
-#embedder, index, rag_inputs, rag_outputs = load_rag()
-emotion_classifier = load_emotion_model()
-enhanced_rag= init_enhanced_rag()
 #users_col, sessions_col, assessments_col = db["users"], db["sessions"], db["assessments"]
 users_col, sessions_col, assessments_col = db["users"], db["sessions"], db["assessments"]
 reminders_col = db["reminders"] 
-CRISIS_KEYWORDS = ["suicide", "kill myself", "end my life", "i want to die", "self harm","i don't want to live","i can't go on"]
 
+# Projected reads (see repositories.py)
+users_repo = repository(users_col)
+assessments_repo = repository(assessments_col)
+reminders_repo = repository(reminders_col)
+CRISIS_KEYWORDS = ["suicide", "kill myself", "end my life", "i want to die", "self harm","i don't want to live","i can't go on"]
 
-# Initialize RAG
-enhanced_rag = init_enhanced_rag()
-# ==================== TTS Engine ====================
-class TTSEngine:
-    def __init__(self):
-        try:
-            self.engine = pyttsx3.init()
-            self.engine.setProperty('rate', 150)
-            self.engine.setProperty('volume', 0.9)
-            self.available = True
-        except:
-            self.available = False
-    
-    def speak(self, text):
-        if not self.available: 
-            return
-        threading.Thread(target=lambda: self.engine.say(text) or self.engine.runAndWait(), daemon=True).start()
+@st.cache_resource
+def init_response_memo():
+    # Crisis messages must always run live, never from the memo
+    return ResponseMemo(maxsize=4096, bypass_keywords=CRISIS_KEYWORDS + KEYWORD_MAPPINGS["crisis"] + ["harm myself"])
 
-tts_engine = TTSEngine()
+response_memo = init_response_memo()
 
 # ==================== Helpers ====================
-def create_user(u, p,gender=None):
-    if users_col.find_one({"username": u}): 
+def create_user(u, p,gender=None, timezone=None):
+    if users_repo.find_one({"username": u}, ["_id"]): 
         return False
     hashed = bcrypt.hashpw(p.encode(), bcrypt.gensalt())
-    users_col.insert_one({"username": u, "password": hashed,"gender": gender, "created_at": datetime.datetime.utcnow()})
+    try:
+        users_col.insert_one({"username": u, "password": hashed,"gender": gender, "timezone": timezone,
+                              "created_at": datetime.datetime.utcnow()})
+    except DuplicateKeyError:
+        # Unique username index: someone registered the name in the meantime
+        return False
     return True
 
 def verify_user(u, p):
-    user = users_col.find_one({"username": u})
+    user = users_repo.find_one({"username": u}, ["password"])
     return bcrypt.checkpw(p.encode(), user["password"]) if user else False
 
 
-def detect_text_emotion(text):
-    """
-    Enhanced emotion detection - tries custom detection first, 
-    then falls back to transformer model
-    """
-    # Try custom keyword-based detection first (faster)
-    emotion, confidence = detect_emotion_from_text(text)
-    
-    if confidence > 0.8:
-        return emotion, confidence
-    
-    # Fallback to transformer model for uncertain cases
-    try:
-        res = emotion_classifier(text)[0]
-        best_emotion = max(res, key=lambda x: x["score"])
-        return best_emotion["label"], best_emotion["score"]
-    except:
-        return emotion, confidence
-
-
 # def retrieve_answer(query, emotion=None):
 #     """Enhanced RAG retrieval with emotion-aware responses and motivational content"""
     
@@ -370,11 +350,30 @@ def retrieve_answer(user_input, emotion):
     """
     Enhanced retrieval that combines RAG + contextual responses
     Priority: RAG knowledge base → Contextual responses
+    
+    Replies are memoized per (normalized text, emotion) until the knowledge
+    base or response library changes; crisis messages are never memoized.
+    While the RAG index is still warming up, replies are keyword-only and
+    memoized under their own version, dropped once the index is ready.
     """
+    enhanced_rag = init_enhanced_rag()
+    return response_memo.get_or_compute(
+        user_input,
+        emotion,
+        (enhanced_rag.version if enhanced_rag else None, RESPONSES_VERSION),
+        lambda: _retrieve_answer_live(user_input, emotion, enhanced_rag)
+    )
+
+def _retrieve_answer_live(user_input, emotion, enhanced_rag):
+    """Uncached RAG lookup with contextual fallback"""
+    if enhanced_rag is None:
+        # Keyword-only mode while the index warms up
+        return get_response(user_input, emotion)
+    
     # Try RAG knowledge base first
     rag_result = enhanced_rag.retrieve_response(user_input, emotion, top_k=3)
     
-    if rag_result and rag_result['confidence'] > 0.65:
+    if rag_result and rag_result['confidence'] >= enhanced_rag.confidence_threshold(0.65):
         # Good match from RAG - use it
         return rag_result['combined']
     
@@ -407,6 +406,8 @@ if 'virtual_chat_history' not in st.session_state:
     st.session_state.virtual_chat_history = []
 if "gender" not in st.session_state:
     st.session_state.gender = None  # Will be set after login
+if "timezone" not in st.session_state:
+    st.session_state.timezone = streaks.DEFAULT_TIMEZONE  # Streak days are the user's local days
 
 # ==================== Authentication Page ====================
 def auth_page():
@@ -422,8 +423,9 @@ def auth_page():
             if verify_user(u, p): 
                 st.session_state.authenticated = True
                 st.session_state.username = u
-                user_data = users_col.find_one({"username": u})
+                user_data = users_repo.find_one({"username": u}, ["gender", "timezone"])
                 st.session_state.gender = user_data.get("gender", "👤")  # Default if not stored
+                st.session_state.timezone = user_data.get("timezone") or streaks.DEFAULT_TIMEZONE
 
                 st.success(f"Welcome back! {st.session_state.gender} {st.session_state.username}")
                 if st.session_state.gender is None:
@@ -437,10 +439,15 @@ def auth_page():
         rp = st.text_input("New Password", type="password", key="reg_pass")
         rpp = st.text_input("Confirm Password", type="password", key="reg_pass2")
         gender = st.radio("Select your gender:", ["👨 Male", "👩 Female"])
+        timezones = sorted(available_timezones()) or ["UTC"]
+        timezone = st.selectbox(
+            "Your timezone (streaks follow your local days):", timezones,
+            index=timezones.index(streaks.DEFAULT_TIMEZONE) if streaks.DEFAULT_TIMEZONE in timezones else 0
+        )
         if st.button("Register"):
             if rp != rpp: 
                 st.error("Passwords don't match")
-            elif create_user(ru, rp): 
+            elif create_user(ru, rp, timezone=timezone): 
                 st.success("Registered! Please login now.")
             else: 
                 st.error("Username already exists")
@@ -465,7 +472,7 @@ def show_pending_reminders(username):
     st.session_state.last_reminder_check = now
     
     try:
-        active_reminders = list(reminders_col.find({"username": username, "enabled": True}))
+        active_reminders = reminders_repo.find({"username": username, "enabled": True}, ["type", "time", "frequency"])
     except:
         return
     
@@ -580,22 +587,27 @@ def clear_old_reminders():
 
 
 def detect_text_emotion(text: str):
-    """Detect emotion from text based on keywords in generate_contextual_response"""
-    text = text.lower()
+    """
+    Enhanced emotion detection - tries custom keyword detection first,
+    then falls back to the transformer model for uncertain cases
+    """
+    # One compiled pass over the text (see chatbot_reponses.BASIC_EMOTION_KEYWORDS)
+    emotion, confidence = detect_basic_emotion(text)
     
-    # Match keywords to emotion
-    if any(word in text for word in ["happy", "joy", "excited", "happiness", "amazing", "awesome"]):
-        return "joy", 0.9
-    elif any(word in text for word in ["sad", "sadness", "down", "cry", "tired"]):
-        return "sadness", 0.9
-    elif any(word in text for word in ["angry", "frustrated", "mad", "furious"]):
-        return "anger", 0.9
-    elif any(word in text for word in ["fear", "afraid", "scared", "panic"]):
-        return "fear", 0.9
-    elif any(word in text for word in ["surprise", "amazed", "wow", "shocked"]):
-        return "surprise", 0.9
-    else:
-        return "neutral", 0.5
+    if confidence > 0.8:
+        return emotion, confidence
+    
+    # Uncertain: the shared inference service batches this with other sessions
+    classifier = load_emotion_model()
+    if classifier is None:
+        # Still warming up: keep the keyword result rather than wait
+        return emotion, confidence
+    try:
+        res = classifier.classify(text)
+        best_emotion = max(res, key=lambda x: x["score"])
+        return best_emotion["label"], best_emotion["score"]
+    except Exception:
+        return emotion, confidence
 
 # ==================== NOW UPDATE YOUR chat_page() FUNCTION ====================
 
@@ -633,6 +645,23 @@ def chat_page():
         # Update session_state when selection changes
         st.session_state.page = selected_page
 
+        if not registry.is_ready():
+            st.caption("⏳ Models are warming up: replies use keyword matching for now")
+
+        with st.expander("⚙️ Startup report"):
+            st.dataframe(pd.DataFrame(registry.report()), use_container_width=True, hide_index=True)
+            emotion_service = registry.get_if_ready("emotion_classifier")
+            if emotion_service is not None:
+                st.caption("Text emotion service (queue + inference latency)")
+                st.dataframe(pd.DataFrame([emotion_service.latency_stats()]), use_container_width=True, hide_index=True)
+
+        with st.expander("📦 Data transfer"):
+            transfers = transfer_report()
+            if transfers:
+                st.dataframe(pd.DataFrame(transfers), use_container_width=True, hide_index=True)
+            else:
+                st.caption("No projected reads yet")
+
         if st.button("Logout"): 
             st.session_state.authenticated = False
             st.session_state.username = None
@@ -657,11 +686,14 @@ def chat_page():
     elif page == "💬 Chat":
         chat_interface()
     elif page == "🎥 Virtual Chat":
+        # Imported here so OpenCV/DeepFace/speech load only for this page
+        from _virtual_chat import virtual_chat_mode
         #virtual_chat_mode(st.session_state.username,detect_text_emotion_func=detect_text_emotion)
         virtual_chat_mode(
             username=st.session_state.username,
             detect_text_emotion_func=detect_text_emotion,
-            retrieve_answer_func=retrieve_answer  # Added this line
+            retrieve_answer_func=retrieve_answer,  # Added this line
+            save_message_func=save_chat_message
         )
 
     elif page == "📊 Analytics":
@@ -670,6 +702,36 @@ def chat_page():
         resources_page()
 
 # ==================== Text Chat ====================
+def save_chat_message(username, user_text, bot_text, emotion, final_emotion=None,
+                      face_emotion=None, face_confidence=None):
+    """
+    Save one chat exchange to sessions and count it in the daily rollup and
+    the login streak (text chat and Virtual Chat both save through here)
+    
+    Args:
+        emotion: Text emotion of the message
+        final_emotion: Emotion the reply was chosen for, when it differs
+            from the text emotion (Virtual Chat trusts a confident face)
+        face_emotion, face_confidence: The camera's reading, if there was one
+    """
+    now = datetime.datetime.utcnow()
+    message = {
+        "username": username,
+        "user_text": user_text,
+        "bot_text": bot_text,
+        "emotion": emotion,
+        "timestamp": now
+    }
+    if final_emotion:
+        message["final_emotion"] = final_emotion
+    if face_confidence is not None:
+        message["face_emotion"] = face_emotion
+        message["face_confidence"] = face_confidence
+    sessions_col.insert_one(message)
+    
+    daily_stats.record_message(db, username, final_emotion or emotion, now, face_emotion, face_confidence)
+    streaks.record(db, username, "login", now, st.session_state.timezone)
+
 def chat_interface():
     st.title("💬 Text Chat")
     
@@ -699,13 +761,7 @@ Please also tell someone you trust - a family member, friend, or colleague. You
             # Use enhanced retrieval with emotion awareness
             bot_reply = retrieve_answer(user_input, text_emotion)
         
-        sessions_col.insert_one({
-            "username": st.session_state.username,
-            "user_text": user_input,
-            "bot_text": bot_reply,
-            "emotion": text_emotion,
-            "timestamp": datetime.datetime.utcnow()
-        })
+        save_chat_message(st.session_state.username, user_input, bot_reply, text_emotion)
         
         st.session_state.chat_history.append({'role': 'user', 'content': user_input})
         st.session_state.chat_history.append({'role': 'assistant', 'content': bot_reply, 'emotion': text_emotion})
@@ -714,6 +770,70 @@ Please also tell someone you trust - a family member, friend, or colleague. You
 # ==================== Virtual Chat with Face Emotion ====================
 
 # ==================== Analytics Page ====================
+# A message's emotion: final_emotion if set, else the detected text emotion
+_MESSAGE_EMOTION = {
+    "$cond": [
+        {"$in": [{"$ifNull": ["$final_emotion", ""]}, [""]]},
+        {"$ifNull": ["$emotion", "neutral"]},
+        "$final_emotion"
+    ]
+}
+
+FACE_SCATTER_SAMPLE = 500
+
+def chat_analytics(username, cutoff):
+    """
+    Chat tab aggregates from the daily rollup (one small document per day)
+
+    Days are UTC days, so the window starts at midnight of the cutoff day.
+    """
+    rows = daily_stats.days(
+        db, username,
+        ["day", "messages", "emotions", "hours", "face_samples", "face_confidence_sum", "face_matches"],
+        since=cutoff, messages={"$gt": 0}
+    )
+    emotions, hourly, weekly = {}, {}, {}
+    daily = []
+    face_samples = face_confidence = face_matches = 0
+    for row in rows:
+        week = row['day'] - datetime.timedelta(days=row['day'].weekday())
+        for emotion, count in row.get('emotions', {}).items():
+            emotions[emotion] = emotions.get(emotion, 0) + count
+            weekly[(week, emotion)] = weekly.get((week, emotion), 0) + count
+            daily.append({'day': row['day'], 'emotion': emotion, 'count': count})
+        for hour, count in row.get('hours', {}).items():
+            hourly[int(hour)] = hourly.get(int(hour), 0) + count
+        face_samples += row.get('face_samples', 0)
+        face_confidence += row.get('face_confidence_sum', 0.0)
+        face_matches += row.get('face_matches', 0)
+
+    return {
+        'total': sum(row['messages'] for row in rows),
+        'emotions': [{'emotion': e, 'count': c} for e, c in sorted(emotions.items(), key=lambda item: -item[1])],
+        'daily': daily,
+        'days_active': len(rows),
+        'hourly': [{'hour': h, 'count': c} for h, c in hourly.items()],
+        'weekly': [{'week': w, 'emotion': e, 'count': c} for (w, e), c in weekly.items()],
+        'face': {'avg': face_confidence / face_samples, 'count': face_samples, 'matches': face_matches}
+                if face_samples else None,
+    }
+
+def face_confidence_sample(username, cutoff, size=FACE_SCATTER_SAMPLE):
+    """Random sample of messages with face data, projected to the plotted fields"""
+    return list(sessions_col.aggregate([
+        {"$match": {"username": username, "timestamp": {"$gte": cutoff}, "face_confidence": {"$type": "number"}}},
+        {"$sample": {"size": size}},
+        {"$project": {
+            "_id": 0,
+            "timestamp": 1,
+            "face_confidence": 1,
+            "face_emotion": {"$ifNull": ["$face_emotion", None]},
+            "emotion": _MESSAGE_EMOTION,
+            "user_text": {"$substrCP": [{"$ifNull": ["$user_text", ""]}, 0, 80]},
+        }},
+        {"$sort": {"timestamp": 1}},
+    ]))
+
 def analytics_page():
     st.title("📊 Analytics Dashboard")
     username = st.session_state.username
@@ -724,34 +844,30 @@ def analytics_page():
     # ==================== TAB 1: CHAT ANALYTICS ====================
     with tab1:
         cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=30)
-        sessions = list(sessions_col.find({"username": username, "timestamp": {"$gte": cutoff}}))
+        stats = chat_analytics(username, cutoff)
         
-        if not sessions:
+        if not stats['total']:
             st.info("💡 Start chatting to see your analytics!")
             return
         
-        df = pd.DataFrame(sessions)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df['date'] = df['timestamp'].dt.date
-        df['hour'] = df['timestamp'].dt.hour
-        df['emotion'] = df.apply(lambda x: x.get('final_emotion') or x.get('emotion', 'neutral'), axis=1)
+        distribution = stats['emotions']
         
         # Key Metrics
         st.subheader("📈 Chat Metrics")
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Total Messages", len(sessions))
+            st.metric("Total Messages", stats['total'])
         with col2:
-            st.metric("Most Common Emotion", df['emotion'].mode()[0].title() if len(df['emotion'].mode()) > 0 else "N/A")
+            st.metric("Most Common Emotion", distribution[0]['emotion'].title() if distribution else "N/A")
         with col3:
-            st.metric("Days Active", df['date'].nunique())
+            st.metric("Days Active", stats['days_active'])
         with col4:
-            avg_conf = df['face_confidence'].mean() if 'face_confidence' in df.columns else 0
+            avg_conf = stats['face']['avg'] if stats['face'] else 0
             st.metric("Avg Face Confidence", f"{avg_conf:.1%}")
         
         # Emotion trends over time
         st.subheader("📈 Emotion Trends Over Time")
-        emotion_over_time = df.groupby(['date', 'emotion']).size().reset_index(name='count')
+        emotion_over_time = pd.DataFrame(stats['daily']).rename(columns={'day': 'date'}).sort_values('date')
         fig = px.line(
             emotion_over_time,
             x='date', 
@@ -768,8 +884,8 @@ def analytics_page():
         
         with col1:
             fig2 = go.Figure(data=[go.Pie(
-                labels=df['emotion'].value_counts().index,
-                values=df['emotion'].value_counts().values,
+                labels=[row['emotion'] for row in distribution],
+                values=[row['count'] for row in distribution],
                 hole=0.3,
                 marker=dict(colors=px.colors.qualitative.Set3)
             )])
@@ -778,7 +894,7 @@ def analytics_page():
         
         with col2:
             # Hourly activity heatmap
-            hourly_data = df.groupby('hour').size().reset_index(name='count')
+            hourly_data = pd.DataFrame(stats['hourly']).sort_values('hour')
             fig3 = px.bar(
                 hourly_data,
                 x='hour',
@@ -791,7 +907,12 @@ def analytics_page():
         # Scatter Plot - Face Confidence vs Text Emotion
         st.subheader("📊 Face Confidence vs Emotion Analysis")
         
-        if 'face_confidence' in df.columns and 'face_emotion' in df.columns:
+        if stats['face']:
+            # Only the plotted fields of a capped sample are fetched
+            df = pd.DataFrame(face_confidence_sample(username, cutoff))
+            if len(df) < stats['face']['count']:
+                st.caption(f"Showing a sample of {len(df)} of {stats['face']['count']} messages")
+            
             # Create scatter plot
             fig4 = px.scatter(
                 df,
@@ -809,10 +930,7 @@ def analytics_page():
             
             # Additional scatter: Emotion correlation
             st.subheader("🔄 Text vs Face Emotion Match")
-            df['emotion_match'] = df.apply(
-                lambda x: 'Match' if x.get('face_emotion') == x.get('emotion') else 'Mismatch', 
-                axis=1
-            )
+            df['emotion_match'] = (df['face_emotion'] == df['emotion']).map({True: 'Match', False: 'Mismatch'})
             
             fig5 = px.scatter(
                 df,
@@ -827,15 +945,15 @@ def analytics_page():
             st.plotly_chart(fig5, use_container_width=True)
             
             # Stats
-            match_rate = (df['emotion_match'] == 'Match').sum() / len(df) * 100
+            match_rate = stats['face']['matches'] / stats['total'] * 100
             st.info(f"📊 Face-Text Emotion Match Rate: **{match_rate:.1f}%**")
         else:
             st.info("💡 Use Virtual Chat with face detection to see face confidence analytics!")
         
         # Weekly emotion summary
         st.subheader("📅 Weekly Emotion Summary")
-        df['week'] = df['timestamp'].dt.to_period('W').astype(str)
-        weekly_emotions = df.groupby(['week', 'emotion']).size().reset_index(name='count')
+        weekly_emotions = pd.DataFrame(stats['weekly']).sort_values('week')
+        weekly_emotions['week'] = weekly_emotions['week'].dt.strftime('%Y-%m-%d')
         fig6 = px.bar(
             weekly_emotions,
             x='week',
@@ -851,7 +969,11 @@ def analytics_page():
         st.subheader("📝 Mental Health Assessment History")
         
         # Fetch all assessments for user
-        assessments = list(assessments_col.find({"username": username}).sort("timestamp", -1))
+        assessments = assessments_repo.find(
+            {"username": username},
+            ["condition", "score", "max_score", "percentage", "timestamp"],
+            sort=[("timestamp", -1)]
+        )
         
         if not assessments:
             st.info("💡 Take assessments in the Resources section to see reports here!")
@@ -962,7 +1084,7 @@ def analytics_page():
         st.subheader("📈 Combined Mental Health Insights")
         
         # Check if we have both chat and assessment data
-        if not sessions:
+        if not stats['total']:
             st.info("💡 No chat data available yet!")
             return
         if not assessments:
@@ -976,8 +1098,9 @@ def analytics_page():
         # Emotion vs Assessment correlation
         st.subheader("🔗 Emotion Patterns vs Assessment Scores")
         
-        # Get dominant emotions per day
-        df_emotions_daily = df.groupby(['date', 'emotion']).size().reset_index(name='count')
+        # Get dominant emotions per day from the daily emotion counts
+        df_emotions_daily = pd.DataFrame(stats['daily'])
+        df_emotions_daily['date'] = df_emotions_daily['day'].dt.date
         dominant_emotion_per_day = df_emotions_daily.loc[df_emotions_daily.groupby('date')['count'].idxmax()]
         
         # Merge with assessments
@@ -1010,7 +1133,8 @@ def analytics_page():
         # Calculate wellness score (inverted assessment scores + positive emotion ratio)
         avg_assessment_score = df_assess['percentage'].mean()
         positive_emotions = ['joy', 'surprise']
-        positive_ratio = (df['emotion'].isin(positive_emotions).sum() / len(df)) * 100
+        positive_count = sum(row['count'] for row in stats['emotions'] if row['emotion'] in positive_emotions)
+        positive_ratio = (positive_count / stats['total']) * 100
         
         wellness_score = ((100 - avg_assessment_score) + positive_ratio) / 2
         
@@ -1077,7 +1201,7 @@ def analytics_page():
         if st.button("📥 Download Full Report (CSV)"):
             # Combine data for download
             report_data = {
-                'Chat Sessions': len(sessions),
+                'Chat Sessions': stats['total'],
                 'Assessments Taken': len(assessments),
                 'Wellness Score': wellness_score,
                 'Positive Emotion %': positive_ratio,
@@ -0,0 +1,159 @@
+"""
+build_rag_index.py
+Offline builder for the RAG index artifact
+
+Usage:
+    python build_rag_index.py --rag-dir rag_knowledges --out rag_index
+    python build_rag_index.py --index-type ivfpq --nprobe 16 --report-recall 10
+
+Defaults (cosine similarity, float16 vectors, exact flat index) match what
+app.py loads.
+
+Writes index.faiss, knowledge_base.json and manifest.json to the output
+directory. EnhancedRAGSystem(index_dir=...) loads that artifact at startup
+and only rebuilds when the manifest no longer matches the JSON sources.
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from enhanced_rag_system import EnhancedRAGSystem, INDEX_TYPES, MIN_ANN_VECTORS
+
+
+def build_rag_index(rag_dir="rag_knowledges", out_dir="rag_index",
+                    model_name="all-MiniLM-L6-v2", cache_dir=".rag_cache",
+                    metric="ip", fp16=True, **index_options):
+    """
+    Build the index from scratch and write it to out_dir
+
+    Extra keyword arguments (index_type, nprobe, ef_search, pq_m, ...) are
+    passed to EnhancedRAGSystem.
+
+    Returns:
+        The built EnhancedRAGSystem, or None on failure
+    """
+    start = time.perf_counter()
+
+    # index_dir=None forces a fresh build instead of loading the old artifact
+    rag = EnhancedRAGSystem(
+        rag_directory=rag_dir,
+        model_name=model_name,
+        cache_dir=cache_dir,
+        index_dir=None,
+        metric=metric,
+        fp16=fp16,
+        **index_options
+    )
+    if rag.index is None:
+        print("❌ Nothing to write: index could not be built")
+        return None
+
+    if not rag.save_index(out_dir):
+        return None
+
+    print(f"✅ Built {rag.index.ntotal} vectors in {time.perf_counter() - start:.1f}s")
+    return rag
+
+
+def bytes_per_vector(index):
+    """Serialized index size divided by the number of vectors"""
+    import faiss
+
+    if index.ntotal == 0:
+        return 0.0
+    return faiss.serialize_index(index).nbytes / index.ntotal
+
+
+def recall_at_k(rag, k=10, n_queries=500, seed=0):
+    """
+    Recall@k of rag.index against an exact flat search over the same vectors
+
+    Queries are a random sample of knowledge base entries. The knowledge base
+    repeats many inputs, so a returned id counts as a hit when its exact
+    distance is no worse than the k-th exact neighbour's (ties are not misses).
+    """
+    import faiss
+
+    vectors = rag.knowledge_embeddings()
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    queries = vectors[rows]
+
+    exact = faiss.IndexFlatIP(vectors.shape[1]) if rag.metric == "ip" else faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    exact_scores, _ = exact.search(queries, k)
+
+    start = time.perf_counter()
+    _, approx_ids = rag.index.search(queries, k)
+    elapsed = time.perf_counter() - start
+
+    hits = 0
+    for q, ids in enumerate(approx_ids):
+        ids = ids[ids >= 0]
+        if rag.metric == "ip":
+            true_scores = vectors[ids] @ queries[q]
+            hits += int(np.sum(true_scores >= exact_scores[q, -1] - 1e-5))
+        else:
+            true_scores = np.sum((vectors[ids] - queries[q]) ** 2, axis=1)
+            hits += int(np.sum(true_scores <= exact_scores[q, -1] + 1e-5))
+
+    return {
+        'k': k,
+        'queries': len(rows),
+        'recall': hits / (len(rows) * k),
+        'ms_per_query': 1000 * elapsed / len(rows),
+        'bytes_per_vector': bytes_per_vector(rag.index),
+        'flat_bytes_per_vector': bytes_per_vector(exact),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the MindSync RAG index artifact")
+    parser.add_argument("--rag-dir", default="rag_knowledges", help="Folder with knowledge base JSON files")
+    parser.add_argument("--out", default="rag_index", help="Output directory for the artifact")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="SentenceTransformer model name")
+    parser.add_argument("--cache-dir", default=".rag_cache", help="Embedding cache directory ('' to disable)")
+    parser.add_argument("--metric", default="ip", choices=["l2", "ip"],
+                        help="l2 distance, or inner product over normalized vectors (cosine)")
+    parser.add_argument("--fp32", action="store_true",
+                        help="Store index vectors as float32 instead of float16")
+    parser.add_argument("--index-type", default="flat", choices=INDEX_TYPES, help="Index backend")
+    parser.add_argument("--nprobe", type=int, default=16, help="IVF lists visited per query (ivfpq)")
+    parser.add_argument("--ef-search", type=int, default=64, help="HNSW search breadth (hnsw)")
+    parser.add_argument("--pq-m", type=int, default=None, help="PQ bytes per vector (ivfpq)")
+    parser.add_argument("--min-ann-vectors", type=int, default=MIN_ANN_VECTORS,
+                        help="Indexes smaller than this stay flat")
+    parser.add_argument("--report-recall", type=int, metavar="K", default=0,
+                        help="Print recall@K of the global index against exact search")
+    args = parser.parse_args(argv)
+
+    rag = build_rag_index(
+        rag_dir=args.rag_dir,
+        out_dir=args.out,
+        model_name=args.model,
+        cache_dir=args.cache_dir or None,
+        metric=args.metric,
+        fp16=not args.fp32,
+        index_type=args.index_type,
+        nprobe=args.nprobe,
+        ef_search=args.ef_search,
+        pq_m=args.pq_m,
+        min_ann_vectors=args.min_ann_vectors
+    )
+    if rag is None:
+        return 1
+
+    if args.report_recall:
+        report = recall_at_k(rag, k=args.report_recall)
+        print(f"📊 Recall@{report['k']} over {report['queries']} queries: {report['recall']:.3f} "
+              f"({report['ms_per_query']:.3f} ms/query)")
+        print(f"   Memory: {report['bytes_per_vector']:.0f} bytes/vector "
+              f"vs {report['flat_bytes_per_vector']:.0f} for float32 flat")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
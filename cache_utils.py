@@ -0,0 +1,157 @@
+"""
+cache_utils.py
+Small thread-safe caches shared across Streamlit sessions
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Case- and whitespace-insensitive cache key for a user message"""
+    return re.sub(r"\s+", " ", text or "").strip().lower()
+
+
+class LRUCache:
+    """
+    Bounded least-recently-used cache with optional time-to-live
+
+    Safe to share between threads (Streamlit runs each session in its own
+    script thread). Pinned entries never expire and are never evicted.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        """
+        Args:
+            maxsize: Maximum number of unpinned entries
+            ttl: Seconds an entry stays valid, or None for no expiry
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, stored_at)
+        self._pinned = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the cached value, or default on a miss or expired entry"""
+        with self._lock:
+            if key in self._pinned:
+                self.hits += 1
+                return self._pinned[key]
+
+            entry = self._data.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry when full"""
+        with self._lock:
+            if key in self._pinned:
+                return
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pin(self, key, value):
+        """Store a value that is never evicted or expired"""
+        with self._lock:
+            self._data.pop(key, None)
+            self._pinned[key] = value
+
+    def clear(self):
+        """Drop all unpinned entries"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data) + len(self._pinned)
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._data),
+                'pinned': len(self._pinned),
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+class ResponseMemo:
+    """
+    Memoizes deterministic chatbot replies keyed by (normalized text, emotion)
+
+    Every lookup carries a version stamp describing the knowledge base and
+    response library; when it changes, all memoized replies are dropped.
+    Messages containing a bypass keyword (crisis phrases) are never cached
+    and always computed live.
+    """
+
+    def __init__(self, maxsize=4096, ttl=None, bypass_keywords=()):
+        self.cache = LRUCache(maxsize, ttl)
+        self.bypass_keywords = tuple(normalize_text(k) for k in bypass_keywords)
+        self.bypassed = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def should_bypass(self, text):
+        """True if the message must always take the live path"""
+        text = normalize_text(text)
+        return any(keyword in text for keyword in self.bypass_keywords)
+
+    def get_or_compute(self, text, emotion, version, compute):
+        """
+        Args:
+            text: User message
+            emotion: Detected emotion used for the reply
+            version: Hashable stamp of everything the reply depends on
+            compute: Zero-argument callable producing the reply on a miss
+
+        Returns:
+            The memoized or freshly computed reply
+        """
+        if self.should_bypass(text):
+            with self._lock:
+                self.bypassed += 1
+            return compute()
+
+        with self._lock:
+            if version != self._version:
+                self.cache.clear()
+                self._version = version
+
+        key = (normalize_text(text), (emotion or "").lower())
+        reply = self.cache.get(key)
+        if reply is None:
+            reply = compute()
+            with self._lock:
+                # Don't store a reply computed against a version that was
+                # replaced while we were computing it
+                if version == self._version:
+                    self.cache.put(key, reply)
+        return reply
+
+    def stats(self):
+        """Cache counters plus how many messages skipped the memo"""
+        stats = self.cache.stats()
+        stats['bypassed'] = self.bypassed
+        return stats
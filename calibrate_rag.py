@@ -0,0 +1,194 @@
+"""
+calibrate_rag.py
+Calibrate RAG confidence scores and thresholds on held-out knowledge base entries
+
+Usage:
+    python calibrate_rag.py --out rag_calibration.json
+    python calibrate_rag.py --no-classifier    # keyword emotions only
+
+A random share of the unique user_input texts is held out, the index is
+built from the remaining entries with the settings app.py loads (cosine,
+float16, flat by default), and each held-out text is retrieved the way the
+app retrieves it: its emotion is detected, routed to an emotion partition
+and searched there. A hit counts as correct when it gives the held-out
+entry's answer. The resulting (score, correct) pairs give:
+    - a monotone mapping from raw score to observed precision, which
+      EnhancedRAGSystem uses as its confidence, and
+    - the lowest confidence threshold whose accepted hits reach the target
+      precision, used instead of the hard-coded 0.6/0.65 cut-offs.
+"""
+
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from enhanced_rag_system import EnhancedRAGSystem, INDEX_TYPES
+
+
+def app_emotion_detector(classifier=None):
+    """
+    The emotion app.py's detect_text_emotion hands to retrieval: keyword
+    detection first, the text classifier only when the keywords are unsure
+    """
+    from chatbot_reponses import detect_basic_emotion
+
+    def detect(text):
+        emotion, confidence = detect_basic_emotion(text)
+        if confidence > 0.8 or classifier is None:
+            return emotion
+        scores = classifier.classify(text)
+        return max(scores, key=lambda x: x["score"])["label"]
+
+    return detect
+
+
+def held_out_scores(rag, holdout=0.2, seed=42, detect_emotion=None):
+    """
+    Retrieve held-out entries through an index built from the rest
+
+    rag must be created with build=False; its index and emotion partitions
+    are built here from the training entries, with its own metric, storage
+    precision and index type. Each held-out text goes through
+    retrieve_many, i.e. the same route_emotion / _search path the app
+    uses, and a hit is correct when it answers with the held-out entry's
+    response (the knowledge base gives every answer several paraphrased
+    inputs).
+
+    Returns:
+        Raw scores and correctness of the top hit per held-out text
+    """
+    detect_emotion = detect_emotion or app_emotion_detector()
+
+    texts = sorted({item['user_input'] for item in rag.knowledge_base})
+    rng = np.random.default_rng(seed)
+    n_held = max(1, int(len(texts) * holdout))
+    held_texts = set(rng.choice(texts, size=n_held, replace=False).tolist())
+
+    # One query per held-out text; duplicates would only repeat the same answer
+    queries = {}
+    for item in rag.knowledge_base:
+        if item['user_input'] in held_texts:
+            queries.setdefault(item['user_input'], item)
+
+    rag.knowledge_base = [item for item in rag.knowledge_base if item['user_input'] not in held_texts]
+    rag.build_index()
+    if rag.index is None:
+        return np.array([]), np.array([], dtype=bool)
+
+    texts = list(queries)
+    results = rag.retrieve_many(texts, [detect_emotion(text) for text in texts], top_k=3)
+
+    raw, correct = [], []
+    for text, result in zip(texts, results):
+        if result is None:
+            continue
+        raw.append(rag.raw_confidence(result['distance']))
+        correct.append(result['combined'] == queries[text]['combined_response'])
+
+    return np.array(raw), np.array(correct, dtype=bool)
+
+
+def fit_calibration(raw, correct, n_bins=10, target_precision=0.8):
+    """
+    Equal-count binning of raw scores, made monotone so a higher raw score
+    never maps to a lower confidence
+    """
+    order = np.argsort(raw)
+    raw, correct = raw[order], correct[order]
+
+    bins = np.array_split(np.arange(len(raw)), min(n_bins, len(raw)))
+    # Rounded before use, so the threshold is exactly a confidence the app
+    # computes from the saved mapping
+    bin_raw = np.array([raw[b].mean() for b in bins]).round(6)
+    bin_precision = np.maximum.accumulate(np.array([correct[b].mean() for b in bins])).round(6)
+
+    confidence = np.interp(raw, bin_raw, bin_precision)
+
+    # Lowest threshold whose accepted hits are still precise enough; the app
+    # accepts confidence >= threshold, the same comparison used here
+    threshold = None
+    for candidate in np.unique(confidence):
+        accepted = confidence >= candidate
+        if correct[accepted].mean() >= target_precision:
+            threshold = float(candidate)
+            break
+
+    accepted = confidence >= threshold if threshold is not None else np.zeros(len(raw), dtype=bool)
+    return {
+        'raw': bin_raw.tolist(),
+        'precision': bin_precision.tolist(),
+        'threshold': threshold,
+        'target_precision': target_precision,
+        'held_out': int(len(raw)),
+        'accept_rate': float(accepted.mean()) if len(raw) else 0.0,
+        'accepted_precision': float(correct[accepted].mean()) if accepted.any() else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate MindSync RAG confidence")
+    parser.add_argument("--rag-dir", default="rag_knowledges", help="Folder with knowledge base JSON files")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="SentenceTransformer model name")
+    parser.add_argument("--metric", default="ip", choices=["l2", "ip"], help="Index metric to calibrate")
+    parser.add_argument("--fp32", action="store_true",
+                        help="Calibrate a float32 index instead of the float16 one the app loads")
+    parser.add_argument("--index-type", default="flat", choices=INDEX_TYPES, help="Index backend to calibrate")
+    parser.add_argument("--no-classifier", action="store_true",
+                        help="Route by keyword emotions only, without the text classifier")
+    parser.add_argument("--cache-dir", default=".rag_cache", help="Embedding cache directory ('' to disable)")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of unique inputs held out")
+    parser.add_argument("--target-precision", type=float, default=0.8, help="Precision the threshold must reach")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="rag_calibration.json", help="Where to write the calibration")
+    args = parser.parse_args(argv)
+
+    # The index is built by held_out_scores, from the training entries only
+    rag = EnhancedRAGSystem(
+        rag_directory=args.rag_dir,
+        model_name=args.model,
+        cache_dir=args.cache_dir or None,
+        metric=args.metric,
+        fp16=not args.fp32,
+        index_type=args.index_type,
+        build=False
+    )
+
+    if not rag.knowledge_base:
+        print("❌ No knowledge base loaded!")
+        return 1
+
+    classifier = None
+    if not args.no_classifier:
+        try:
+            from emotion_service import EmotionInferenceService
+
+            classifier = EmotionInferenceService(backend="int8")
+        except Exception as e:
+            print(f"⚠️ Text classifier unavailable ({e}), routing by keyword emotions only")
+
+    raw, correct = held_out_scores(rag, holdout=args.holdout, seed=args.seed,
+                                   detect_emotion=app_emotion_detector(classifier))
+    if not len(raw):
+        print("❌ No held-out queries could be scored")
+        return 1
+
+    calibration = fit_calibration(raw, correct, target_precision=args.target_precision)
+    calibration['model'] = args.model
+    calibration['metric'] = args.metric
+    calibration['fp16'] = rag.fp16
+    calibration['index_type'] = args.index_type
+
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(calibration, f, indent=2)
+
+    print(f"✅ Calibrated on {calibration['held_out']} held-out inputs")
+    print(f"   Threshold: {calibration['threshold']} "
+          f"(accepts {calibration['accept_rate']:.0%}, precision {calibration['accepted_precision']})")
+    print(f"   Written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+camera_capture.py
+Background camera capture with a latest-frame buffer
+
+One CameraCapture per virtual chat session owns the device on its own
+thread and keeps overwriting a small preallocated ring of frames. The page
+and the face detector read the newest frame from the ring instead of
+calling VideoCapture.read() once per Streamlit rerun.
+
+Any cv2.VideoCapture source works: a camera index, a video file (handy as
+a stand-in camera) or an object with the same read()/isOpened()/release()
+methods such as SyntheticSource below.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+RING_SIZE = 3
+
+
+class SyntheticSource:
+    """Moving test pattern with the VideoCapture read/isOpened/release API"""
+
+    def __init__(self, width=640, height=480):
+        self.width = width
+        self.height = height
+        self._t = 0
+        self._opened = True
+
+    def isOpened(self):
+        return self._opened
+
+    def read(self, image=None):
+        if not self._opened:
+            return False, None
+        if image is None or image.shape != (self.height, self.width, 3):
+            image = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        x = np.arange(self.width, dtype=np.uint16)
+        image[:] = ((x + self._t * 4) % 256).astype(np.uint8)[np.newaxis, :, np.newaxis]
+        self._t += 1
+        return True, image
+
+    def release(self):
+        self._opened = False
+
+
+class CameraCapture:
+    """
+    Capture thread writing into a ring of preallocated frames
+
+    The writer never touches the slot holding the newest frame or the slot
+    last handed to a reader, so latest() can return a read-only view with no
+    copy. A short lock only guards which slot is which, never pixel data.
+    """
+
+    def __init__(self, source=0, width=640, height=480, fps=30, mirror=True,
+                 loop=True, idle_timeout=30.0, reopen_after=30):
+        """
+        Args:
+            source: Camera index, video file path, or a VideoCapture-like object
+            width, height, fps: Requested camera mode (ignored by files)
+            mirror: Flip frames horizontally, like a mirror
+            loop: Restart a video file when it ends
+            idle_timeout: Stop capturing when nobody has read a frame for this
+                many seconds (an abandoned browser tab), None to never stop
+            reopen_after: Consecutive failed reads before reopening the device
+        """
+        self.source = source
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.mirror = mirror
+        self.loop = loop
+        self.idle_timeout = idle_timeout
+        self.reopen_after = reopen_after
+
+        self._cap = None
+        self._is_file = isinstance(source, str)
+        self._ring = None
+        self._scratch = None
+        self._latest = None      # slot with the newest complete frame
+        self._reading = None     # slot last handed out by latest()
+        self._written = -1       # slot most recently written
+        self._slot_lock = threading.Lock()
+
+        self.seq = 0             # frames published so far
+        self.reopens = 0
+        self._last_read_at = time.monotonic()
+        self._started_at = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    # ==================== LIFECYCLE ====================
+
+    def _open(self):
+        import cv2
+
+        if not isinstance(self.source, (int, str)):
+            return self.source
+
+        cap = cv2.VideoCapture(self.source)
+        if not self._is_file:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+            cap.set(cv2.CAP_PROP_FPS, self.fps)
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def start(self):
+        """Open the source and start the capture thread; False if it won't open"""
+        self._cap = self._open()
+        if not self._cap.isOpened():
+            self._cap.release()
+            self._cap = None
+            return False
+
+        self._started_at = time.monotonic()
+        self._last_read_at = self._started_at
+        self._thread = threading.Thread(target=self._run, name="camera-capture", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """Stop the thread and release the device"""
+        self._stopped.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # ==================== READERS ====================
+
+    def latest(self):
+        """
+        Newest frame without copying
+
+        Returns:
+            (seq, read-only frame view), or (0, None) before the first frame.
+            The view stays valid until the next latest() call; copy it if it
+            must outlive that (e.g. handed to another thread).
+        """
+        self._last_read_at = time.monotonic()
+        with self._slot_lock:
+            slot = self._latest
+            if slot is None:
+                return 0, None
+            self._reading = slot
+            seq = self.seq
+
+        view = self._ring[slot].view()
+        view.flags.writeable = False
+        return seq, view
+
+    def stats(self):
+        """Frames captured and measured capture rate"""
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            'frames': self.seq,
+            'fps': self.seq / elapsed if elapsed > 0 else 0.0,
+            'reopens': self.reopens,
+            'running': self.running,
+        }
+
+    # ==================== CAPTURE THREAD ====================
+
+    def _next_slot(self):
+        with self._slot_lock:
+            for step in range(1, RING_SIZE + 1):
+                slot = (self._written + step) % RING_SIZE
+                if slot != self._latest and slot != self._reading:
+                    return slot
+
+    def _publish(self, slot):
+        with self._slot_lock:
+            self._written = slot
+            self._latest = slot
+            self.seq += 1
+
+    def _allocate(self, frame):
+        if self._ring is None or self._ring[0].shape != frame.shape:
+            self._ring = [np.empty_like(frame) for _ in range(RING_SIZE)]
+            with self._slot_lock:
+                self._latest = self._reading = None
+                self._written = -1
+
+    def _rewind(self):
+        import cv2
+
+        self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def _run(self):
+        import cv2
+
+        # Cameras block in read(); files and synthetic sources need pacing
+        interval = 0.0 if isinstance(self.source, int) else 1.0 / self.fps
+        failures = 0
+        try:
+            while not self._stopped.is_set():
+                if self.idle_timeout is not None and time.monotonic() - self._last_read_at > self.idle_timeout:
+                    print("ℹ️ Camera idle, stopping capture")
+                    break
+
+                started = time.monotonic()
+                ok, frame = self._cap.read(self._scratch)
+                if not ok or frame is None:
+                    failures += 1
+                    if self._is_file and self.loop:
+                        self._rewind()
+                    elif failures >= self.reopen_after:
+                        # Device lost: reopen it here rather than in the page
+                        self._cap.release()
+                        time.sleep(0.5)
+                        self._cap = self._open()
+                        self.reopens += 1
+                        failures = 0
+                    else:
+                        time.sleep(0.01)
+                    continue
+
+                failures = 0
+                self._scratch = frame
+                self._allocate(frame)
+                slot = self._next_slot()
+                if self.mirror:
+                    cv2.flip(frame, 1, dst=self._ring[slot])
+                else:
+                    np.copyto(self._ring[slot], frame)
+                self._publish(slot)
+
+                if interval:
+                    time.sleep(max(0.0, interval - (time.monotonic() - started)))
+        finally:
+            self._cap.release()
+            self._stopped.set()
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python camera_capture.py [video_file]  -> capture rate and read latency
+    source = sys.argv[1] if len(sys.argv) > 1 else SyntheticSource()
+    camera = CameraCapture(source, fps=30, idle_timeout=None)
+    if not camera.start():
+        print(f"❌ Could not open {source}")
+        sys.exit(1)
+
+    reads, last_seq, read_time = 0, 0, 0.0
+    end = time.monotonic() + 3.0
+    while time.monotonic() < end:
+        start = time.perf_counter()
+        seq, frame = camera.latest()
+        read_time += time.perf_counter() - start
+        if seq != last_seq:
+            reads += 1
+            last_seq = seq
+        time.sleep(1 / 60)
+
+    camera.stop()
+    stats = camera.stats()
+    print(f"✅ Captured {stats['frames']} frames at {stats['fps']:.1f} fps, saw {reads} new frames")
+    print(f"   latest() took {read_time / max(reads, 1) * 1e6:.1f} µs per new frame")
@@ -3,6 +3,10 @@ chatbot_responses.py
 Complete conversational response library for MindSync AI chatbot
 """
 
+import hashlib
+import json
+import re
+
 # ========== RESPONSE LIBRARY ==========
 
 RESPONSES = {
@@ -520,19 +524,158 @@ KEYWORD_MAPPINGS = {
 }
 
 
+# Changes whenever RESPONSES or KEYWORD_MAPPINGS change; used to invalidate
+# memoized replies
+RESPONSES_VERSION = hashlib.sha1(
+    json.dumps([RESPONSES, KEYWORD_MAPPINGS], sort_keys=True).encode("utf-8")
+).hexdigest()
+
+
+# ========== KEYWORD MATCHING ==========
+
+class KeywordMatcher:
+    """
+    Single-pass matcher over ordered keyword groups
+    
+    Keywords are compiled at construction time into a table keyed by their
+    first word, so matching is one scan over the words of the text with a
+    dict lookup per word (a word-level Aho-Corasick). Keywords only match
+    whole words ("sad" does not match "crusade"). Group order is priority
+    order.
+    """
+    
+    # Words, keeping inner apostrophes ("don't", "what's")
+    TOKEN_RE = re.compile(r"\w+(?:'\w+)*")
+    
+    def __init__(self, groups):
+        """
+        Args:
+            groups: Ordered mapping of group name -> list of keywords
+        """
+        self.names = list(groups)
+        self._single = {}  # word -> priorities of groups with that one-word keyword
+        self._multi = {}   # first word -> [(keyword words, priority)]
+        
+        for priority, name in enumerate(self.names):
+            for keyword in groups[name]:
+                words = self.TOKEN_RE.findall(keyword.lower())
+                if len(words) == 1:
+                    self._single.setdefault(words[0], set()).add(priority)
+                elif words:
+                    self._multi.setdefault(words[0], []).append((words, priority))
+    
+    def _matched_priorities(self, text):
+        """Priorities of all groups with a keyword in text"""
+        words = self.TOKEN_RE.findall(text.lower())
+        found = set()
+        
+        for i, word in enumerate(words):
+            single = self._single.get(word)
+            if single:
+                found.update(single)
+            
+            multi = self._multi.get(word)
+            if multi:
+                for keyword_words, priority in multi:
+                    if words[i:i + len(keyword_words)] == keyword_words:
+                        found.add(priority)
+        return found
+    
+    def match(self, text):
+        """Names of all groups with a keyword in text, in priority order"""
+        return [self.names[p] for p in sorted(self._matched_priorities(text))]
+    
+    def first(self, text):
+        """Highest-priority matching group name, or None"""
+        found = self._matched_priorities(text)
+        return self.names[min(found)] if found else None
+
+
+class SubstringMatcher:
+    """
+    Single-pass matcher with `keyword in text` semantics
+    
+    Unlike KeywordMatcher, keywords also match inside longer words
+    ("panic" in "panicky", "mad" in "made"), exactly like the substring
+    checks the emotion detectors were written against. One regex with a
+    lookahead visits every position of the text and reports the longest
+    keyword starting there. Any other keyword starting at that position
+    is a prefix of it, so each keyword is mapped to the groups of all its
+    prefixes. The keywords are compiled as a character trie, so each
+    position costs one branch per character instead of one try per
+    keyword. Group order is priority order.
+    """
+    
+    def __init__(self, groups):
+        """
+        Args:
+            groups: Ordered mapping of group name -> list of keywords
+        """
+        self.names = list(groups)
+        owners = {}  # keyword -> priorities of groups listing it
+        for priority, name in enumerate(self.names):
+            for keyword in groups[name]:
+                if keyword:
+                    owners.setdefault(keyword, set()).add(priority)
+        
+        self._groups_of = {
+            keyword: frozenset().union(*(owners[p] for p in owners if keyword.startswith(p)))
+            for keyword in owners
+        }
+        self._pattern = re.compile(f"(?=({self._trie_pattern(owners)}))") if owners else None
+    
+    @staticmethod
+    def _trie_pattern(keywords):
+        """Regex matching the longest of keywords at a position, built as a trie"""
+        trie = {}
+        for keyword in keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[""] = {}  # a keyword ends here
+        
+        def build(node):
+            branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+            if not branches:
+                return ""
+            body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+            # Greedy: try the longer keywords first, fall back to the one ending here
+            return f"(?:{body})?" if "" in node else body
+        
+        return build(trie)
+    
+    def _matched_priorities(self, text):
+        found = set()
+        if self._pattern is not None:
+            for m in self._pattern.finditer(text.lower()):
+                found |= self._groups_of[m.group(1)]
+        return found
+    
+    def match(self, text):
+        """Names of all groups with a keyword in text, in priority order"""
+        return [self.names[p] for p in sorted(self._matched_priorities(text))]
+    
+    def first(self, text):
+        """Highest-priority matching group name, or None"""
+        found = self._matched_priorities(text)
+        return self.names[min(found)] if found else None
+
+
+# Compiled once at import; KEYWORD_MAPPINGS order is the response priority
+KEYWORD_MATCHER = KeywordMatcher(KEYWORD_MAPPINGS)
+
+
 # ========== MAIN FUNCTION ==========
 
 def get_response(query, emotion=None):
     """
     Main function to get appropriate response based on user query
     """
-    query_lower = query.lower()
+    # One pass over the text finds the highest-priority category
+    response_key = KEYWORD_MATCHER.first(query)
     
-    # Check each category in priority order
-    for response_key, keywords in KEYWORD_MAPPINGS.items():
-        # Check for pattern match
-        if any(keyword in query_lower for keyword in keywords):
-            return RESPONSES.get(response_key, RESPONSES["default"])
+    if response_key:
+        return RESPONSES.get(response_key, RESPONSES["default"])
     
     # If no specific match, return default
     return RESPONSES["default"]
@@ -540,37 +683,107 @@ def get_response(query, emotion=None):
 
 # ========== EMOTION DETECTION ==========
 
-def detect_emotion_from_text(text):
-    """Enhanced emotion detection"""
-    text_lower = text.lower()
-    
-    # Crisis (highest priority)
-    if any(word in text_lower for word in KEYWORD_MAPPINGS["crisis"]):
-        return "fear", 0.95
-    
-    # Severe depression
-    if any(word in text_lower for word in KEYWORD_MAPPINGS["severe_depression"]):
-        return "sadness", 0.95
+# Cascade rules for detect_emotion_from_text, highest priority first:
+# (KEYWORD_MAPPINGS group, emotion, confidence)
+EMOTION_RULES = [
+    ("crisis", "fear", 0.95),             # Crisis (highest priority)
+    ("severe_depression", "sadness", 0.95),
+    ("anger", "anger", 0.9),              # Strong negative emotions
+    ("anxiety", "fear", 0.85),            # Fear/Anxiety
+    ("sadness", "sadness", 0.85),
+    ("happiness", "joy", 0.9),            # Joy/Happiness
+    ("success", "joy", 0.85),
+]
+
+# Short word lists used by the app's quick text emotion check, in priority order
+BASIC_EMOTION_KEYWORDS = {
+    "joy": ["happy", "joy", "excited", "happiness", "amazing", "awesome"],
+    "sadness": ["sad", "sadness", "down", "cry", "tired"],
+    "anger": ["angry", "frustrated", "mad", "furious"],
+    "fear": ["fear", "afraid", "scared", "panic"],
+    "surprise": ["surprise", "amazed", "wow", "shocked"],
+}
+
+# One matcher for every emotion keyword group, so a single scan of the text
+# answers both detect_emotion_from_text and detect_basic_emotion. Substring
+# semantics keep stems working ("panicky", "stressful", "thankful");
+# tests/test_keyword_matcher.py checks it against the original cascades
+EMOTION_MATCHER = SubstringMatcher({
+    **{group: KEYWORD_MAPPINGS[group] for group, _, _ in EMOTION_RULES},
+    **{f"basic_{emotion}": keywords for emotion, keywords in BASIC_EMOTION_KEYWORDS.items()},
+})
+
+
+def match_emotion_groups(text):
+    """All emotion keyword groups present in text, from one pass"""
+    return set(EMOTION_MATCHER.match(text))
+
+
+def detect_emotion_from_text(text, groups=None):
+    """
+    Enhanced emotion detection
     
-    # Strong negative emotions
-    if any(word in text_lower for word in KEYWORD_MAPPINGS["anger"]):
-        return "anger", 0.9
+    Args:
+        text: User message
+        groups: Result of match_emotion_groups(text), if already computed
+    """
+    if groups is None:
+        groups = match_emotion_groups(text)
     
-    # Fear/Anxiety
-    if any(word in text_lower for word in KEYWORD_MAPPINGS["anxiety"]):
-        return "fear", 0.85
+    for group, emotion, confidence in EMOTION_RULES:
+        if group in groups:
+            return emotion, confidence
     
-    # Sadness
-    if any(word in text_lower for word in KEYWORD_MAPPINGS["sadness"]):
-        return "sadness", 0.85
+    # Default neutral
+    return "neutral", 0.5
+
+
+def detect_basic_emotion(text, groups=None):
+    """
+    Quick emotion check over BASIC_EMOTION_KEYWORDS
     
-    # Joy/Happiness
-    if any(word in text_lower for word in KEYWORD_MAPPINGS["happiness"]):
-        return "joy", 0.9
+    Args:
+        text: User message
+        groups: Result of match_emotion_groups(text), if already computed
+    """
+    if groups is None:
+        groups = match_emotion_groups(text)
     
-    # Success
-    if any(word in text_lower for word in KEYWORD_MAPPINGS["success"]):
-        return "joy", 0.85
+    for emotion in BASIC_EMOTION_KEYWORDS:
+        if f"basic_{emotion}" in groups:
+            return emotion, 0.9
     
-    # Default neutral
     return "neutral", 0.5
+
+
+# ========== BENCHMARK ==========
+
+if __name__ == "__main__":
+    import timeit
+    
+    def get_response_substring_loop(query):
+        """The previous implementation: substring scan of every category"""
+        query_lower = query.lower()
+        for response_key, keywords in KEYWORD_MAPPINGS.items():
+            if any(keyword in query_lower for keyword in keywords):
+                return RESPONSES.get(response_key, RESPONSES["default"])
+        return RESPONSES["default"]
+    
+    samples = [
+        "hi",
+        "I'm so stressed about my exams tomorrow",
+        "my friends and I watched a movie after school",
+        "I had a long day and nothing really happened, just thinking about stuff",
+        "I got promoted at work today and I'm so happy!",
+        "the crusade in history class was boring",
+        "honestly I don't know what to say " * 10,
+    ]
+    
+    # The old loop returns early on substring false positives ("hi" inside
+    # "nothing"), so some of its fast rows are fast because they are wrong
+    print(f"{'message':<50} {'loop µs':>9} {'compiled µs':>12}")
+    for text in samples:
+        n = 2000
+        loop_time = timeit.timeit(lambda: get_response_substring_loop(text), number=n) / n * 1e6
+        compiled_time = timeit.timeit(lambda: get_response(text), number=n) / n * 1e6
+        print(f"{text[:48]!r:<50} {loop_time:>9.1f} {compiled_time:>12.1f}")
@@ -0,0 +1,225 @@
+"""
+daily_stats.py
+Per-user daily rollup maintained on write
+
+    user_daily_stats    one document per (user, UTC day)
+        _id                 "username:YYYY-MM-DD"
+        username, date      date is "YYYY-MM-DD", day the same at midnight
+        messages            chat messages sent
+        emotions            {emotion: messages}
+        hours               {"0".."23": messages}
+        face_samples        messages with a face reading
+        face_confidence_sum, face_matches
+        journal             True once the day has a mood journal entry
+        mood, mood_score    that entry's mood
+        exercises           exercises completed
+        exercise_types      {type: completed}
+
+The code paths that insert into sessions, mood_journal and exercises call
+the record_* functions right after the insert, so the rollup is kept up to
+date with one $inc upsert per write. Dashboards read at most one small
+document per day instead of re-deriving the same facts from raw documents.
+
+Usage (build the rollup from existing data):
+    python daily_stats.py --uri mongodb://localhost:27017
+    python daily_stats.py --uri mongodb://localhost:27017 --user alice
+"""
+
+import argparse
+import datetime
+import sys
+
+from pymongo import ReplaceOne
+
+from repositories import repository
+
+COLLECTION = "user_daily_stats"
+DB_NAME = "final_chatbot_talks"
+
+
+def _field(name):
+    """A value usable as a field name in the histogram maps"""
+    name = str(name or "unknown").replace(".", "_").lstrip("$")
+    return name or "unknown"
+
+
+def _day(timestamp):
+    date = timestamp.date()
+    return date.isoformat(), datetime.datetime.combine(date, datetime.time())
+
+
+def _bump(db, username, timestamp, update):
+    """Upsert the user's document for the day of timestamp"""
+    date, day = _day(timestamp)
+    update["$setOnInsert"] = {"username": username, "date": date, "day": day}
+    try:
+        db[COLLECTION].update_one({"_id": f"{username}:{date}"}, update, upsert=True)
+    except Exception as e:
+        # The raw document is already saved; a backfill repairs the rollup
+        print(f"⚠️ Could not update daily stats for {username}: {e}")
+
+
+# ==================== WRITERS ====================
+
+def record_message(db, username, emotion, timestamp, face_emotion=None, face_confidence=None):
+    """Count one chat message saved to sessions"""
+    emotion = _field(emotion or "neutral")
+    inc = {
+        "messages": 1,
+        f"emotions.{emotion}": 1,
+        f"hours.{timestamp.hour}": 1,
+    }
+    if isinstance(face_confidence, (int, float)):
+        inc["face_samples"] = 1
+        inc["face_confidence_sum"] = float(face_confidence)
+        inc["face_matches"] = int(_field(face_emotion) == emotion)
+    _bump(db, username, timestamp, {"$inc": inc})
+
+
+def record_journal(db, username, mood, mood_score, timestamp):
+    """Mark the day as journaled (the latest entry's mood wins)"""
+    _bump(db, username, timestamp, {"$set": {"journal": True, "mood": mood, "mood_score": mood_score}})
+
+
+def record_exercise(db, username, exercise_type, timestamp):
+    """Count one completed exercise"""
+    _bump(db, username, timestamp, {"$inc": {"exercises": 1, f"exercise_types.{_field(exercise_type)}": 1}})
+
+
+# ==================== READERS ====================
+
+def days(db, username, fields, since=None, newest_first=False, limit=0, **match):
+    """
+    A user's daily documents, oldest first
+
+    Args:
+        db: pymongo Database
+        username: Whose days
+        fields: Fields to return (see the module docstring)
+        since: Only days on or after this date/datetime
+        newest_first: Newest day first instead
+        limit: Most days to return, 0 for all
+        **match: Extra conditions, e.g. journal=True or messages={"$gt": 0}
+
+    Returns:
+        List of documents
+    """
+    query = {"username": username, **match}
+    if since is not None:
+        since = since.date() if isinstance(since, datetime.datetime) else since
+        query["date"] = {"$gte": since.isoformat()}
+    return repository(db[COLLECTION]).find(
+        query, fields, sort=[("date", -1 if newest_first else 1)], limit=limit
+    )
+
+
+def totals(db, username):
+    """All-time message, journal-day and exercise counts"""
+    result = list(db[COLLECTION].aggregate([
+        {"$match": {"username": username}},
+        {"$group": {
+            "_id": None,
+            "messages": {"$sum": {"$ifNull": ["$messages", 0]}},
+            "journal_days": {"$sum": {"$cond": [{"$eq": ["$journal", True]}, 1, 0]}},
+            "exercises": {"$sum": {"$ifNull": ["$exercises", 0]}},
+        }},
+    ]))
+    if not result:
+        return {"messages": 0, "journal_days": 0, "exercises": 0}
+    result[0].pop("_id")
+    return result[0]
+
+
+# ==================== BACKFILL ====================
+
+def _empty_day(username, date, day):
+    return {
+        "_id": f"{username}:{date}", "username": username, "date": date, "day": day,
+        "messages": 0, "emotions": {}, "hours": {},
+        "face_samples": 0, "face_confidence_sum": 0.0, "face_matches": 0,
+        "exercises": 0, "exercise_types": {},
+    }
+
+
+def _add(counts, key, n=1):
+    counts[key] = counts.get(key, 0) + n
+
+
+def backfill(db, username=None, batch_size=1000):
+    """
+    Rebuild the rollup from sessions, mood_journal and exercises
+
+    Days are replaced whole, so running it again gives the same result.
+    Run it while nobody is writing, or live $inc updates made during the
+    run may be overwritten.
+
+    Returns:
+        Number of daily documents written
+    """
+    query = {} if username is None else {"username": username}
+    rollup = {}
+
+    def day_doc(doc):
+        timestamp = doc.get("timestamp")
+        if not isinstance(timestamp, datetime.datetime) or "username" not in doc:
+            return None
+        date, day = _day(timestamp)
+        key = (doc["username"], date)
+        if key not in rollup:
+            rollup[key] = _empty_day(doc["username"], date, day)
+        return rollup[key]
+
+    fields = {"_id": 0, "username": 1, "timestamp": 1, "emotion": 1, "final_emotion": 1,
+              "face_emotion": 1, "face_confidence": 1}
+    for doc in db["sessions"].find(query, fields, batch_size=batch_size):
+        stats = day_doc(doc)
+        if stats is None:
+            continue
+        emotion = _field(doc.get("final_emotion") or doc.get("emotion") or "neutral")
+        stats["messages"] += 1
+        _add(stats["emotions"], emotion)
+        _add(stats["hours"], str(doc["timestamp"].hour))
+        if isinstance(doc.get("face_confidence"), (int, float)):
+            stats["face_samples"] += 1
+            stats["face_confidence_sum"] += float(doc["face_confidence"])
+            stats["face_matches"] += int(_field(doc.get("face_emotion")) == emotion)
+
+    fields = {"_id": 0, "username": 1, "timestamp": 1, "mood": 1, "mood_score": 1}
+    for doc in db["mood_journal"].find(query, fields, sort=[("timestamp", 1)], batch_size=batch_size):
+        stats = day_doc(doc)
+        if stats is not None:
+            stats.update(journal=True, mood=doc.get("mood"), mood_score=doc.get("mood_score"))
+
+    fields = {"_id": 0, "username": 1, "timestamp": 1, "type": 1}
+    for doc in db["exercises"].find(query, fields, batch_size=batch_size):
+        stats = day_doc(doc)
+        if stats is not None:
+            stats["exercises"] += 1
+            _add(stats["exercise_types"], _field(doc.get("type")))
+
+    docs = list(rollup.values())
+    for start in range(0, len(docs), batch_size):
+        db[COLLECTION].bulk_write(
+            [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs[start:start + batch_size]],
+            ordered=False
+        )
+    return len(docs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the user_daily_stats rollup from existing data")
+    parser.add_argument("--uri", default="mongodb://localhost:27017", help="MongoDB connection string")
+    parser.add_argument("--db", default=DB_NAME, help="Database name")
+    parser.add_argument("--user", default=None, help="Only rebuild this user's days")
+    args = parser.parse_args(argv)
+
+    from pymongo import MongoClient
+    db = MongoClient(args.uri, serverSelectionTimeoutMS=5000)[args.db]
+
+    written = backfill(db, args.user)
+    print(f"✅ Wrote {written} daily documents to {COLLECTION}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
 import streamlit as st
 from pymongo import MongoClient
 
+from db_indexes import ensure_indexes
+
 @st.cache_resource
 def get_db():
     mongo_uri = st.secrets.get("MONGO_URI") or st.secrets.get("mongo_key")
@@ -17,4 +19,7 @@ def get_db():
     # Fail fast if unreachable
     client.admin.command("ping")
 
-    return client["final_chatbot_talks"]
+    db = client["final_chatbot_talks"]
+    # Idempotent; runs once per process because get_db is cached
+    ensure_indexes(db)
+    return db
@@ -0,0 +1,280 @@
+"""
+db_indexes.py
+Index bootstrap for every MongoDB collection the app queries
+
+ensure_indexes(db) is called once per process from db.get_db(). It is
+idempotent: creating an index that already exists with the same keys and
+options is a no-op on the server.
+
+Each index follows the shape of the queries that use it: equality fields
+first (username, then status/type/...), then the sort or range field.
+
+Usage (explain-plan check of the hot queries for COLLSCAN and in-memory SORT):
+    python db_indexes.py --uri mongodb://localhost:27017
+    python db_indexes.py --mongomock
+"""
+
+import argparse
+import sys
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+DB_NAME = "final_chatbot_talks"
+
+INDEXES = {
+    "users": [
+        IndexModel([("username", ASCENDING)], unique=True, name="username_unique"),
+    ],
+    "sessions": [
+        # Analytics window, recent-emotion lookups and streaks
+        IndexModel([("username", ASCENDING), ("timestamp", DESCENDING)], name="username_timestamp"),
+    ],
+    "assessments": [
+        IndexModel([("username", ASCENDING), ("timestamp", DESCENDING)], name="username_timestamp"),
+    ],
+    "mood_journal": [
+        IndexModel([("username", ASCENDING), ("timestamp", DESCENDING)], name="username_timestamp"),
+        IndexModel([("username", ASCENDING), ("date", ASCENDING)], name="username_date"),
+    ],
+    "goals": [
+        IndexModel([("username", ASCENDING), ("status", ASCENDING)], name="username_status"),
+        IndexModel([("username", ASCENDING), ("created_at", DESCENDING)], name="username_created"),
+    ],
+    "exercises": [
+        IndexModel([("username", ASCENDING), ("type", ASCENDING), ("timestamp", DESCENDING)],
+                   name="username_type_timestamp"),
+        IndexModel([("username", ASCENDING), ("timestamp", DESCENDING)], name="username_timestamp"),
+    ],
+    "achievements": [
+        IndexModel([("username", ASCENDING), ("achievement_id", ASCENDING)], unique=True,
+                   name="username_achievement_unique"),
+    ],
+    "reminders": [
+        IndexModel([("username", ASCENDING), ("type", ASCENDING)], name="username_type"),
+        IndexModel([("username", ASCENDING), ("enabled", ASCENDING)], name="username_enabled"),
+    ],
+    "coping_plans": [
+        IndexModel([("username", ASCENDING), ("active", ASCENDING), ("created_at", DESCENDING)],
+                   name="username_active_created"),
+        IndexModel([("username", ASCENDING), ("created_at", DESCENDING)], name="username_created"),
+    ],
+    "mood_boards": [
+        IndexModel([("username", ASCENDING), ("timestamp", DESCENDING)], name="username_timestamp"),
+    ],
+    "gratitude_jar": [
+        IndexModel([("username", ASCENDING), ("timestamp", DESCENDING)], name="username_timestamp"),
+        IndexModel([("username", ASCENDING), ("category", ASCENDING), ("timestamp", DESCENDING)],
+                   name="username_category_timestamp"),
+    ],
+    "worry_box": [
+        IndexModel([("username", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)],
+                   name="username_status_created"),
+        IndexModel([("username", ASCENDING), ("status", ASCENDING), ("resolved_at", DESCENDING)],
+                   name="username_status_resolved"),
+    ],
+    "user_daily_stats": [
+        # _id is "username:date"; range reads go through this one
+        IndexModel([("username", ASCENDING), ("date", DESCENDING)], name="username_date"),
+    ],
+    "virtual_chat_sessions": [
+        # Sparse: headers saved before session ids existed have none
+        IndexModel([("session_id", ASCENDING)], unique=True, sparse=True, name="session_id_unique"),
+        IndexModel([("username", ASCENDING), ("timestamp", DESCENDING)], name="username_timestamp"),
+    ],
+    "virtual_chat_turns": [
+        IndexModel([("session_id", ASCENDING), ("seq", ASCENDING)], name="session_seq"),
+    ],
+    "virtual_chat_emotions": [
+        IndexModel([("session_id", ASCENDING), ("seq", ASCENDING)], name="session_seq"),
+    ],
+    "snapshot_refs": [
+        IndexModel([("username", ASCENDING), ("session_id", ASCENDING), ("created_at", DESCENDING)],
+                   name="username_session_created"),
+        IndexModel([("username", ASCENDING), ("digest", ASCENDING)], name="username_digest"),
+    ],
+}
+
+# (collection, filter, sort) for the queries pages run on every visit
+HOT_QUERIES = [
+    ("users", {"username": "u"}, None),
+    ("sessions", {"username": "u", "timestamp": {"$gte": 0}}, None),
+    ("sessions", {"username": "u"}, [("timestamp", -1)]),
+    ("assessments", {"username": "u"}, [("timestamp", -1)]),
+    ("mood_journal", {"username": "u"}, [("timestamp", -1)]),
+    ("mood_journal", {"username": "u", "date": "2024-01-01"}, None),
+    ("mood_journal", {"username": "u", "timestamp": {"$gte": 0}}, None),
+    ("goals", {"username": "u", "status": "active"}, None),
+    ("goals", {"username": "u"}, [("created_at", -1)]),
+    ("exercises", {"username": "u", "type": "gratitude"}, [("timestamp", -1)]),
+    ("exercises", {"username": "u"}, [("timestamp", -1)]),
+    ("achievements", {"username": "u"}, None),
+    ("achievements", {"username": "u", "achievement_id": "first_chat"}, None),
+    ("reminders", {"username": "u", "enabled": True}, None),
+    ("reminders", {"username": "u", "type": "checkin"}, None),
+    ("coping_plans", {"username": "u", "active": True}, [("created_at", -1)]),
+    ("coping_plans", {"username": "u"}, [("created_at", -1)]),
+    ("mood_boards", {"username": "u"}, [("timestamp", -1)]),
+    ("gratitude_jar", {"username": "u"}, [("timestamp", -1)]),
+    ("gratitude_jar", {"username": "u", "category": "🤝 People"}, [("timestamp", -1)]),
+    ("worry_box", {"username": "u"}, None),
+    ("worry_box", {"username": "u", "status": "active"}, [("created_at", -1)]),
+    ("worry_box", {"username": "u", "status": "resolved"}, [("resolved_at", -1)]),
+    ("user_daily_stats", {"username": "u", "date": {"$gte": "2024-01-01"}}, [("date", 1)]),
+    ("user_daily_stats", {"username": "u", "messages": {"$gt": 0}}, [("date", -1)]),
+    ("user_daily_stats", {"username": "u", "journal": True}, [("date", -1)]),
+    ("virtual_chat_turns", {"session_id": "s"}, [("seq", 1)]),
+    ("snapshot_refs", {"username": "u", "session_id": "s"}, [("created_at", -1)]),
+    ("snapshot_refs", {"username": "u", "digest": "d"}, None),
+]
+
+
+def ensure_indexes(db):
+    """
+    Create any missing index (safe to call on every start)
+
+    A unique index that can't be built because existing documents already
+    collide is reported and skipped, so startup never fails on old data.
+    Indexes are created one at a time so such a failure doesn't also skip
+    the other indexes of that collection.
+
+    Returns:
+        Number of indexes that could not be created
+    """
+    failures = 0
+    for name, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                db[name].create_indexes([index])
+            except OperationFailure as e:
+                failures += 1
+                print(f"⚠️ Could not create index {index.document['name']} on {name}: {e}")
+    if failures == 0:
+        print(f"✅ Indexes ready on {len(INDEXES)} collections")
+    return failures
+
+
+# ==================== EXPLAIN-PLAN HARNESS ====================
+
+def _plan_stages(plan):
+    """All stage names in a winning plan tree"""
+    stages = [plan.get("stage")]
+    if "inputStage" in plan:
+        stages += _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+def _explain_stages(db, collection, query, sort):
+    cursor = db[collection].find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    winning = cursor.explain()["queryPlanner"]["winningPlan"]
+    # Slot-based engine (MongoDB 7+) nests the classic plan under queryPlan
+    return _plan_stages(winning.get("queryPlan", winning))
+
+
+def _is_equality(condition):
+    return not isinstance(condition, dict) or set(condition) == {"$eq"}
+
+
+def _index_stages(keys, query, sort):
+    """
+    Stages the server would run for a query on one index (None if unusable)
+
+    The index is usable when its leading key is filtered or sorted on. It
+    provides the sort when the keys before the sort fields are all equality
+    filters and the sort fields follow in index order, all in the index's
+    directions or all reversed; otherwise the results are sorted in memory.
+    """
+    keys = list(keys)
+    fields = [field for field, _ in keys]
+    sort = sort or []
+    if fields[0] not in query and (not sort or sort[0][0] != fields[0]):
+        return None
+
+    prefix = 0
+    while prefix < len(fields) and fields[prefix] in query and _is_equality(query[fields[prefix]]):
+        prefix += 1
+
+    stages = ["FETCH", "IXSCAN"]
+    if sort:
+        following = keys[prefix:prefix + len(sort)]
+        same = [field for field, _ in following] == [field for field, _ in sort]
+        directions = {direction * wanted for (_, direction), (_, wanted) in zip(following, sort)}
+        if not same or len(directions) != 1:
+            stages.insert(0, "SORT")
+    return stages
+
+
+def _static_stages(db, collection, query, sort):
+    """
+    Plan approximation for servers without explain (mongomock)
+
+    Picks the index that avoids an in-memory sort and matches the most
+    equality-filtered fields; with no usable index the query is a
+    collection scan (plus a sort, if it has one).
+    """
+    best = None
+    for name, index in db[collection].index_information().items():
+        if name == "_id_":
+            continue
+        stages = _index_stages(index["key"], query, sort)
+        if stages is None:
+            continue
+        matched = sum(1 for field, _ in index["key"] if field in query)
+        rank = ("SORT" not in stages, matched)
+        if best is None or rank > best[0]:
+            best = (rank, stages)
+    if best is not None:
+        return best[1]
+    return ["SORT", "COLLSCAN"] if sort else ["COLLSCAN"]
+
+
+def check_hot_queries(db, use_explain=True):
+    """
+    Plan every hot query and report the ones an index doesn't serve
+
+    Returns:
+        List of (collection, filter, stages) that include a COLLSCAN or an
+        in-memory SORT
+    """
+    problems = []
+    for collection, query, sort in HOT_QUERIES:
+        planner = _explain_stages if use_explain else _static_stages
+        stages = planner(db, collection, query, sort)
+        bad = "COLLSCAN" in stages or "SORT" in stages
+        marker = "❌" if bad else "✅"
+        print(f"{marker} {collection} {query} sort={sort}: {' <- '.join(s for s in stages if s)}")
+        if bad:
+            problems.append((collection, query, stages))
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create MongoDB indexes and check hot queries for COLLSCAN/SORT")
+    parser.add_argument("--uri", default="mongodb://localhost:27017", help="MongoDB connection string")
+    parser.add_argument("--db", default=DB_NAME, help="Database name")
+    parser.add_argument("--mongomock", action="store_true",
+                        help="Use an in-memory mongomock database (static plan check, no explain)")
+    args = parser.parse_args(argv)
+
+    if args.mongomock:
+        import mongomock
+        db = mongomock.MongoClient()[args.db]
+    else:
+        from pymongo import MongoClient
+        db = MongoClient(args.uri, serverSelectionTimeoutMS=5000)[args.db]
+
+    ensure_indexes(db)
+    problems = check_hot_queries(db, use_explain=not args.mongomock)
+    if problems:
+        print(f"❌ {len(problems)} hot queries scan a whole collection or sort in memory")
+        return 1
+    print(f"✅ No COLLSCAN or in-memory SORT in {len(HOT_QUERIES)} hot queries")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+embedding_cache.py
+Content-addressed, on-disk store for sentence embeddings
+Lets the RAG system skip re-encoding knowledge base entries on every cold start
+"""
+
+import hashlib
+import json
+import os
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding store keyed by (model name, text hash).
+
+    Vectors live in a single float16 ``.npy`` file that is opened with
+    ``mmap_mode='r'``, so cached rows are paged in by the OS instead of being
+    read and decoded up front. A small JSON file records which text hash is
+    stored in which row. New texts are appended; existing rows never move.
+    """
+
+    def __init__(self, cache_dir=".rag_cache", model_name="all-MiniLM-L6-v2"):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+
+        safe_name = model_name.replace("/", "__")
+        self.vectors_path = os.path.join(cache_dir, f"{safe_name}.f16.npy")
+        self.keys_path = os.path.join(cache_dir, f"{safe_name}.keys.json")
+
+        self._vectors = None
+        self._rows = {}
+        self._load()
+
+    def _load(self):
+        """Open the existing store (if any) without reading the vectors"""
+        if not (os.path.exists(self.vectors_path) and os.path.exists(self.keys_path)):
+            return
+
+        try:
+            with open(self.keys_path, "r", encoding="utf-8") as f:
+                keys = json.load(f)
+            vectors = np.load(self.vectors_path, mmap_mode="r")
+
+            if len(keys) != vectors.shape[0]:
+                print(f"⚠️ Embedding cache {self.vectors_path} is inconsistent, ignoring it")
+                return
+
+            self._vectors = vectors
+            self._rows = {key: row for row, key in enumerate(keys)}
+        except Exception as e:
+            print(f"⚠️ Could not open embedding cache: {e}")
+            self._vectors = None
+            self._rows = {}
+
+    def key(self, text):
+        """Content address of a text for this cache's model"""
+        digest = hashlib.sha1()
+        digest.update(self.model_name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get_or_encode(self, texts, encode_fn):
+        """
+        Return a float32 matrix of embeddings for ``texts``
+
+        Args:
+            texts: List of strings, in the order the rows should be returned
+            encode_fn: Callable taking a list of strings and returning an
+                (n, dim) numpy array; only called for texts not yet cached
+
+        Returns:
+            (embeddings, n_encoded) where n_encoded is how many unique texts
+            had to go through the model
+        """
+        keys = [self.key(text) for text in texts]
+
+        # Encode each missing text once, even if it appears many times
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self._rows and key not in missing:
+                missing[key] = text
+
+        if missing:
+            new_vectors = np.asarray(encode_fn(list(missing.values())), dtype=np.float32)
+            self._append(list(missing.keys()), new_vectors)
+
+        rows = np.fromiter((self._rows[key] for key in keys), dtype=np.int64, count=len(keys))
+        embeddings = np.asarray(self._vectors[rows], dtype=np.float32)
+        return embeddings, len(missing)
+
+    def _append(self, keys, vectors):
+        """Append new rows and atomically replace the files on disk"""
+        vectors = vectors.astype(np.float16)
+
+        if self._vectors is not None and self._vectors.shape[1] != vectors.shape[1]:
+            # Model output size changed under the same name, start over
+            self._vectors = None
+            self._rows = {}
+
+        if self._vectors is not None:
+            combined = np.concatenate([np.asarray(self._vectors), vectors])
+            all_keys = [None] * len(self._rows)
+            for key, row in self._rows.items():
+                all_keys[row] = key
+            all_keys.extend(keys)
+        else:
+            combined = vectors
+            all_keys = list(keys)
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            tmp_vectors = self.vectors_path + ".tmp"
+            tmp_keys = self.keys_path + ".tmp"
+            with open(tmp_vectors, "wb") as f:
+                np.save(f, combined)
+            with open(tmp_keys, "w", encoding="utf-8") as f:
+                json.dump(all_keys, f)
+
+            # Vectors first: a stale keys file shorter than the vectors is
+            # detected as inconsistent on the next load
+            os.replace(tmp_vectors, self.vectors_path)
+            os.replace(tmp_keys, self.keys_path)
+
+            self._vectors = np.load(self.vectors_path, mmap_mode="r")
+        except Exception as e:
+            # Read-only or full disk: keep working from memory
+            print(f"⚠️ Could not persist embedding cache: {e}")
+            self._vectors = combined
+
+        self._rows = {key: row for row, key in enumerate(all_keys)}
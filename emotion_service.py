@@ -0,0 +1,210 @@
+"""
+emotion_service.py
+Shared, micro-batching text emotion classifier
+
+One instance (cached with st.cache_resource) serves every Streamlit
+session. Requests from concurrent sessions are queued and run through the
+transformer together, so CPU time is spent on batches instead of
+per-call overhead.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+DEFAULT_EMOTION_MODEL = "j-hartmann/emotion-english-distilroberta-base"
+
+BACKENDS = ("pytorch", "int8", "onnx")
+
+# Longer messages are cut to the model's input size instead of failing
+MAX_TOKENS = 512
+
+
+class EmotionInferenceService:
+    """
+    In-process inference worker with a request queue
+
+    The worker thread takes the first waiting request, then keeps collecting
+    more for up to max_wait_ms (or until max_batch_size) and classifies the
+    whole batch in one pipeline call.
+    """
+
+    def __init__(self, model_name=DEFAULT_EMOTION_MODEL, backend="int8",
+                 max_batch_size=16, max_wait_ms=5, latency_window=1000):
+        """
+        Args:
+            model_name: Hugging Face text-classification model
+            backend: "pytorch" (as downloaded), "int8" (dynamically quantized
+                Linear layers) or "onnx" (ONNX Runtime export, needs optimum)
+            max_batch_size: Most requests classified in one call
+            max_wait_ms: How long the first request of a batch may wait for
+                company
+            latency_window: Number of recent requests kept for percentiles
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
+
+        self.model_name = model_name
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self.classifier = self._load_pipeline()
+
+        self._queue = queue.Queue()
+        self._latencies = deque(maxlen=latency_window)
+        self._batch_sizes = deque(maxlen=latency_window)
+        self._stats_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+        self._worker = threading.Thread(target=self._run, name="emotion-inference", daemon=True)
+        self._worker.start()
+
+    # ==================== MODEL LOADING ====================
+
+    def _load_pipeline(self):
+        """Build the transformers pipeline for the configured backend"""
+        from transformers import pipeline
+
+        if self.backend == "onnx":
+            try:
+                from optimum.onnxruntime import ORTModelForSequenceClassification
+                from transformers import AutoTokenizer
+
+                model = ORTModelForSequenceClassification.from_pretrained(self.model_name, export=True)
+                tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                print("✅ Emotion model exported to ONNX Runtime")
+                return pipeline("text-classification", model=model, tokenizer=tokenizer, return_all_scores=True)
+            except ImportError:
+                print("⚠️ optimum[onnxruntime] not installed, using int8 PyTorch model instead")
+                self.backend = "int8"
+
+        if self.backend == "int8":
+            try:
+                import torch
+                from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+                model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+                model.eval()
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+                tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+                print("✅ Emotion model quantized to int8")
+                return pipeline("text-classification", model=model, tokenizer=tokenizer, return_all_scores=True)
+            except Exception as e:
+                print(f"⚠️ Could not quantize emotion model ({e}), using float model")
+                self.backend = "pytorch"
+
+        return pipeline("text-classification", model=self.model_name, return_all_scores=True)
+
+    # ==================== PUBLIC API ====================
+
+    def submit(self, text):
+        """Queue one text; returns a Future resolving to its label scores"""
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def classify(self, text, timeout=10.0):
+        """
+        Classify one text, batched with whatever else is waiting
+
+        Returns:
+            List of {"label", "score"} dicts, like pipeline(...)[0]
+        """
+        return self.submit(text).result(timeout=timeout)
+
+    def __call__(self, texts):
+        """Drop-in for the pipeline: accepts a string or a list of strings"""
+        if isinstance(texts, str):
+            texts = [texts]
+        futures = [self.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    def latency_stats(self):
+        """p50/p99 end-to-end latency (queue + inference) and batching counters"""
+        with self._stats_lock:
+            latencies = np.array(self._latencies)
+            batch_sizes = np.array(self._batch_sizes)
+
+        if len(latencies) == 0:
+            return {'requests': 0, 'p50_ms': None, 'p99_ms': None, 'avg_batch_size': None,
+                    'queue_depth': self._queue.qsize(), 'backend': self.backend}
+
+        return {
+            'requests': int(len(latencies)),
+            'p50_ms': float(np.percentile(latencies, 50) * 1000),
+            'p99_ms': float(np.percentile(latencies, 99) * 1000),
+            'avg_batch_size': float(batch_sizes.mean()),
+            'queue_depth': self._queue.qsize(),
+            'backend': self.backend,
+        }
+
+    def close(self):
+        """Stop the worker thread"""
+        self._stopped.set()
+        self._queue.put(None)
+
+    # ==================== WORKER ====================
+
+    def _collect_batch(self):
+        """Block for one request, then gather more until full or max_wait passes"""
+        first = self._queue.get()
+        if first is None:
+            return []
+
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopped.set()
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            texts = [text for text, _, _ in batch]
+            try:
+                results = self._classify(texts)
+            except Exception:
+                # Don't let one bad request fail everyone batched with it
+                self._run_one_by_one(batch)
+                continue
+
+            done = time.perf_counter()
+            for (_, future, submitted), result in zip(batch, results):
+                future.set_result(result)
+                with self._stats_lock:
+                    self._latencies.append(done - submitted)
+            with self._stats_lock:
+                self._batch_sizes.append(len(batch))
+
+    def _classify(self, texts):
+        return self.classifier(texts, batch_size=len(texts), truncation=True, max_length=MAX_TOKENS)
+
+    def _run_one_by_one(self, batch):
+        for text, future, submitted in batch:
+            try:
+                result = self._classify([text])[0]
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            future.set_result(result)
+            with self._stats_lock:
+                self._latencies.append(time.perf_counter() - submitted)
+                self._batch_sizes.append(1)
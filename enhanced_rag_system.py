@@ -4,21 +4,134 @@ Complete RAG knowledge base that combines JSON files + conversational AI
 Optimized for AI Therapist with emotional support
 """
 
+import hashlib
 import json
 import os
+import time
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+from cache_utils import LRUCache, normalize_text
+from embedding_cache import EmbeddingCache
+
+# Bump when the on-disk layout written by save_index changes
+INDEX_FORMAT_VERSION = 4
+
+INDEX_FILE = "index.faiss"
+KNOWLEDGE_FILE = "knowledge_base.json"
+MANIFEST_FILE = "manifest.json"
+PARTITIONS_DIR = "partitions"
+
+INDEX_TYPES = ("flat", "ivfpq", "hnsw")
+
+# Approximate indexes only pay off (and IVF-PQ only trains well) on larger
+# collections; smaller indexes and partitions stay exact
+MIN_ANN_VECTORS = 10000
+
+# Keyword groups whose phrases are pre-encoded and pinned in the query cache,
+# so "hi" / "thanks" / "bye" never reach the transformer
+PINNED_QUERY_GROUPS = ("greeting", "how_are_you", "thank_you", "goodbye")
+
+# Maps emotion labels (text classifier, DeepFace and keyword detector) to the
+# knowledge base partition searched for them. None means search everything.
+EMOTION_CATEGORY_ROUTES = {
+    'joy': 'happiness',
+    'happy': 'happiness',
+    'happiness': 'happiness',
+    'sadness': 'sadness',
+    'sad': 'sadness',
+    'fear': 'anxiety',
+    'anxiety': 'anxiety',
+    'anxious': 'anxiety',
+    'depression': 'depression',
+    'depressed': 'depression',
+    'neutral': 'neutral',
+    'surprise': None,
+    'anger': None,
+    'angry': None,
+    'disgust': None,
+}
 
 class EnhancedRAGSystem:
-    def __init__(self, rag_directory="rag_knowledges"):
+    def __init__(self, rag_directory="rag_knowledges", model_name="all-MiniLM-L6-v2",
+                 cache_dir=".rag_cache", index_dir=None, metric="l2", fp16=False,
+                 calibration_path=None, build=True, index_type="flat", nprobe=16,
+                 ef_search=64, pq_m=None, hnsw_m=32, min_ann_vectors=MIN_ANN_VECTORS,
+                 query_cache_size=2048, query_cache_ttl=6 * 3600):
+        """
+        Args:
+            rag_directory: Folder with the knowledge base JSON files
+            model_name: SentenceTransformer model used for entries and queries
+            cache_dir: On-disk embedding cache (None to disable)
+            index_dir: Prebuilt index artifact to load, or to write after a build
+            metric: "l2" (Euclidean on raw vectors) or "ip" (inner product on
+                L2-normalized vectors, i.e. cosine similarity)
+            fp16: Store index vectors as float16 (half the memory)
+            calibration_path: JSON written by calibrate_rag.py mapping raw
+                scores to calibrated confidence
+            build: Set False to only load the knowledge base (offline tools)
+            index_type: "flat" (exact), "ivfpq" (inverted lists + product
+                quantization) or "hnsw" (graph); approximate types are only
+                used for indexes with at least min_ann_vectors entries
+            nprobe: IVF lists visited per query (ivfpq recall/speed knob)
+            ef_search: HNSW candidate list size (hnsw recall/speed knob)
+            pq_m: PQ sub-quantizers, i.e. bytes per vector (default dimension/8)
+            hnsw_m: HNSW neighbours per node
+            min_ann_vectors: Smaller indexes are built flat
+            query_cache_size: Normalized query texts whose embeddings are kept
+                in memory (0 disables the cache)
+            query_cache_ttl: Seconds a cached query embedding stays valid
+        """
+        if metric not in ("l2", "ip"):
+            raise ValueError(f"Unknown metric: {metric}")
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type: {index_type}")
+        
         self.rag_dir = rag_directory
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.index_dir = index_dir
+        self.metric = metric
+        self.fp16 = fp16
+        self.index_type = index_type
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+        self.hnsw_m = hnsw_m
+        self.min_ann_vectors = min_ann_vectors
+        self.calibration = self._load_calibration(calibration_path)
         self.knowledge_base = []
         self.embedder = None
         self.index = None
+        self.partitions = {}  # emotion_category -> {'index': faiss index, 'ids': global row ids}
+        self.version = None  # stamp of the sources + settings the index was built from
+        self.query_cache = LRUCache(query_cache_size, query_cache_ttl) if query_cache_size else None
+        
+        # Prefer a prebuilt index artifact; rebuild only when it is stale
+        if build and index_dir and self.load_index(index_dir):
+            self.warm_query_cache()
+            return
         
         # Load all knowledge
         self.load_all_knowledge()
+        if not build:
+            return
         self.build_index()
+        
+        if index_dir and self.index is not None:
+            self.save_index(index_dir)
+        self.warm_query_cache()
+    
+    def source_checksums(self):
+        """SHA-256 of every knowledge base JSON file, keyed by filename"""
+        checksums = {}
+        if not os.path.exists(self.rag_dir):
+            return checksums
+        
+        for file in sorted(os.listdir(self.rag_dir)):
+            if file.endswith('.json'):
+                with open(os.path.join(self.rag_dir, file), 'rb') as f:
+                    checksums[file] = hashlib.sha256(f.read()).hexdigest()
+        return checksums
     
     def load_all_knowledge(self):
         """Load all JSON files from rag_knowledges folder"""
@@ -26,7 +139,8 @@ class EnhancedRAGSystem:
             print(f"Warning: {self.rag_dir} folder not found!")
             return
         
-        for file in os.listdir(self.rag_dir):
+        # Sorted so row order (and therefore the index) is reproducible
+        for file in sorted(os.listdir(self.rag_dir)):
             if file.endswith('.json'):
                 filepath = os.path.join(self.rag_dir, file)
                 try:
@@ -56,31 +170,363 @@ class EnhancedRAGSystem:
             return
         
         try:
-            import faiss
+            embeddings = self.knowledge_embeddings()
             
-            # Initialize embedder
-            self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
+            # Build FAISS index
+            self.index = self._train_index(embeddings)
             
-            # Create embeddings for all user inputs
-            user_inputs = [item['user_input'] for item in self.knowledge_base]
-            embeddings = self.embedder.encode(user_inputs, convert_to_numpy=True)
+            # One sub-index per emotion category, so emotion-aware queries
+            # only scan (and always return) entries from that category
+            self.partitions = {}
+            for category, ids in self._partition_ids().items():
+                partition_index = self._train_index(embeddings[ids])
+                self.partitions[category] = {'index': partition_index, 'ids': ids}
             
-            # Build FAISS index
-            dimension = embeddings.shape[1]
-            self.index = faiss.IndexFlatL2(dimension)
-            self.index.add(embeddings)
+            self.version = self._version_stamp()
             
-            print(f"✅ Built FAISS index with {len(self.knowledge_base)} entries")
+            print(f"✅ Built FAISS index with {len(self.knowledge_base)} entries "
+                  f"in {len(self.partitions)} emotion partitions")
         except Exception as e:
             print(f"❌ Error building index: {e}")
     
+    def knowledge_embeddings(self):
+        """
+        Embeddings of every knowledge base user_input, ready to add to an index
+        
+        Only entries missing from the on-disk cache go through the model.
+        """
+        # Initialize embedder
+        self._load_embedder()
+        
+        user_inputs = [item['user_input'] for item in self.knowledge_base]
+        start = time.perf_counter()
+        if self.cache_dir:
+            cache = EmbeddingCache(self.cache_dir, self.model_name)
+            embeddings, n_encoded = cache.get_or_encode(
+                user_inputs,
+                lambda texts: self.embedder.encode(texts, convert_to_numpy=True)
+            )
+        else:
+            embeddings = self.embedder.encode(user_inputs, convert_to_numpy=True)
+            n_encoded = len(user_inputs)
+        print(f"✅ Embeddings ready: {n_encoded} encoded, "
+              f"{len(user_inputs) - n_encoded} from cache "
+              f"({time.perf_counter() - start:.2f}s)")
+        
+        return self._prepare_vectors(embeddings)
+    
+    def encode_queries(self, queries, batch_size=32):
+        """
+        Encode query texts into vectors comparable with the index
+        
+        Queries are normalized (case, whitespace) and looked up in the query
+        cache first; only the misses go through the transformer, in one batch.
+        """
+        keys = [normalize_text(query) for query in queries]
+        if self.query_cache is None:
+            embeddings = self.embedder.encode(keys, convert_to_numpy=True, batch_size=batch_size)
+            return self._prepare_vectors(embeddings)
+        
+        vectors = [self.query_cache.get(key) for key in keys]
+        missing = sorted({key for key, vector in zip(keys, vectors) if vector is None})
+        
+        if missing:
+            encoded = self._prepare_vectors(
+                self.embedder.encode(missing, convert_to_numpy=True, batch_size=batch_size)
+            )
+            fresh = dict(zip(missing, encoded))
+            for key, vector in fresh.items():
+                self.query_cache.put(key, vector)
+            vectors = [fresh[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+        
+        return np.vstack(vectors)
+    
+    def warm_query_cache(self):
+        """Pre-encode and pin common greetings so they never hit the model"""
+        if self.query_cache is None or self.embedder is None or self.index is None:
+            return
+        
+        from chatbot_reponses import KEYWORD_MAPPINGS
+        
+        phrases = sorted({
+            normalize_text(phrase)
+            for group in PINNED_QUERY_GROUPS
+            for phrase in KEYWORD_MAPPINGS.get(group, [])
+        })
+        if not phrases:
+            return
+        
+        try:
+            vectors = self._prepare_vectors(self.embedder.encode(phrases, convert_to_numpy=True))
+            for phrase, vector in zip(phrases, vectors):
+                self.query_cache.pin(phrase, vector)
+        except Exception as e:
+            print(f"⚠️ Could not warm query cache: {e}")
+    
+    def query_cache_stats(self):
+        """Hit/miss counters of the query embedding cache"""
+        return self.query_cache.stats() if self.query_cache is not None else {}
+    
+    def _prepare_vectors(self, embeddings):
+        """float32, contiguous and, in "ip" mode, unit length"""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if self.metric == "ip":
+            import faiss
+            
+            embeddings = embeddings.copy()
+            faiss.normalize_L2(embeddings)
+        return embeddings
+    
+    def _train_index(self, vectors):
+        """New index over vectors, trained first if the index type needs it"""
+        index = self._new_index(vectors.shape[1], len(vectors))
+        if not index.is_trained:
+            index.train(vectors)
+        index.add(vectors)
+        self._apply_search_params(index)
+        return index
+    
+    def _new_index(self, dimension, n_vectors=0):
+        """Empty index for the configured type, metric and storage precision"""
+        import faiss
+        
+        faiss_metric = faiss.METRIC_INNER_PRODUCT if self.metric == "ip" else faiss.METRIC_L2
+        
+        if self.index_type == "ivfpq" and n_vectors >= self.min_ann_vectors:
+            # ~4*sqrt(n) lists, with enough points per list to train k-means
+            nlist = max(1, min(int(4 * np.sqrt(n_vectors)), n_vectors // 39))
+            pq_m = self.pq_m or self._default_pq_m(dimension)
+            if self.metric == "ip":
+                quantizer = faiss.IndexFlatIP(dimension)
+            else:
+                quantizer = faiss.IndexFlatL2(dimension)
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, 8, faiss_metric)
+            # The index must own the quantizer once this function returns
+            index.own_fields = True
+            quantizer.this.disown()
+            return index
+        
+        if self.index_type == "hnsw" and n_vectors >= self.min_ann_vectors:
+            if self.fp16:
+                return faiss.IndexHNSWSQ(dimension, faiss.ScalarQuantizer.QT_fp16, self.hnsw_m, faiss_metric)
+            return faiss.IndexHNSWFlat(dimension, self.hnsw_m, faiss_metric)
+        
+        if self.fp16:
+            return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss_metric)
+        if self.metric == "ip":
+            return faiss.IndexFlatIP(dimension)
+        return faiss.IndexFlatL2(dimension)
+    
+    @staticmethod
+    def _default_pq_m(dimension):
+        """Largest divisor of dimension not above dimension/8 (e.g. 48 bytes for 384-d)"""
+        for m in range(max(1, dimension // 8), 0, -1):
+            if dimension % m == 0:
+                return m
+        return 1
+    
+    def _apply_search_params(self, index):
+        """Set the nprobe / efSearch knobs on an approximate index"""
+        import faiss
+        
+        try:
+            ivf = faiss.extract_index_ivf(index)
+            ivf.nprobe = min(self.nprobe, ivf.nlist)
+        except Exception:
+            pass
+        
+        if hasattr(index, 'hnsw'):
+            index.hnsw.efSearch = self.ef_search
+    
+    def set_search_params(self, nprobe=None, ef_search=None):
+        """Change the recall/speed trade-off of a built or loaded index"""
+        if nprobe is not None:
+            self.nprobe = nprobe
+        if ef_search is not None:
+            self.ef_search = ef_search
+        
+        if self.index is not None:
+            self._apply_search_params(self.index)
+        for partition in self.partitions.values():
+            self._apply_search_params(partition['index'])
+    
+    def _partition_ids(self):
+        """Global row ids of each emotion_category, in knowledge base order"""
+        groups = {}
+        for row, item in enumerate(self.knowledge_base):
+            groups.setdefault(item['emotion_category'], []).append(row)
+        return {category: np.array(rows, dtype=np.int64) for category, rows in groups.items()}
+    
+    def route_emotion(self, emotion):
+        """Partition to search for an emotion label, or None for the global index"""
+        if not emotion:
+            return None
+        
+        emotion = emotion.lower()
+        category = EMOTION_CATEGORY_ROUTES.get(emotion, emotion)
+        return category if category in self.partitions else None
+    
+    def _load_embedder(self):
+        """Load the query/document encoder once"""
+        if self.embedder is None:
+            # Imported here: sentence-transformers pulls in torch
+            from sentence_transformers import SentenceTransformer
+            
+            self.embedder = SentenceTransformer(self.model_name)
+        return self.embedder
+    
+    def _manifest(self):
+        """Describe the current index so a later load can tell if it is stale"""
+        return {
+            'format_version': INDEX_FORMAT_VERSION,
+            'model': self.model_name,
+            'metric': self.metric,
+            'fp16': self.fp16,
+            'index_type': self.index_type,
+            'pq_m': self.pq_m,
+            'hnsw_m': self.hnsw_m,
+            'min_ann_vectors': self.min_ann_vectors,
+            'dimension': int(self.index.d),
+            'entries': len(self.knowledge_base),
+            'partitions': {category: int(p['index'].ntotal) for category, p in self.partitions.items()},
+            'files': self.source_checksums(),
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        }
+    
+    def _version_stamp(self):
+        """Hash of everything that determines which entry a query retrieves"""
+        manifest = self._manifest()
+        manifest.pop('built_at')
+        return hashlib.sha1(json.dumps(manifest, sort_keys=True).encode('utf-8')).hexdigest()
+    
+    def save_index(self, index_dir):
+        """
+        Write the FAISS index, knowledge base metadata and manifest
+        
+        The manifest is written last, so a reader never sees a fresh
+        manifest next to a half-written index.
+        """
+        try:
+            import faiss
+            
+            os.makedirs(index_dir, exist_ok=True)
+            
+            index_path = os.path.join(index_dir, INDEX_FILE)
+            faiss.write_index(self.index, index_path + '.tmp')
+            os.replace(index_path + '.tmp', index_path)
+            
+            knowledge_path = os.path.join(index_dir, KNOWLEDGE_FILE)
+            with open(knowledge_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(self.knowledge_base, f, ensure_ascii=False)
+            os.replace(knowledge_path + '.tmp', knowledge_path)
+            
+            partitions_dir = os.path.join(index_dir, PARTITIONS_DIR)
+            os.makedirs(partitions_dir, exist_ok=True)
+            for category, partition in self.partitions.items():
+                partition_path = os.path.join(partitions_dir, f"{category}.faiss")
+                faiss.write_index(partition['index'], partition_path + '.tmp')
+                os.replace(partition_path + '.tmp', partition_path)
+            
+            manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+            with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(self._manifest(), f, indent=2)
+            os.replace(manifest_path + '.tmp', manifest_path)
+            
+            print(f"✅ Saved FAISS index artifact to {index_dir}")
+            return True
+        except Exception as e:
+            print(f"❌ Error saving index: {e}")
+            return False
+    
+    def is_index_stale(self, index_dir):
+        """True if the artifact in index_dir does not match the current sources"""
+        manifest_path = os.path.join(index_dir, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return True
+        
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except Exception:
+            return True
+        
+        return (
+            manifest.get('format_version') != INDEX_FORMAT_VERSION
+            or manifest.get('model') != self.model_name
+            or manifest.get('metric') != self.metric
+            or manifest.get('fp16') != self.fp16
+            or manifest.get('index_type') != self.index_type
+            or manifest.get('pq_m') != self.pq_m
+            or manifest.get('hnsw_m') != self.hnsw_m
+            or manifest.get('min_ann_vectors') != self.min_ann_vectors
+            or manifest.get('files') != self.source_checksums()
+        )
+    
+    @staticmethod
+    def _read_index(path):
+        """Read an index file, memory-mapped where the index type allows it"""
+        import faiss
+        
+        try:
+            return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except Exception:
+            return faiss.read_index(path)
+    
+    def load_index(self, index_dir):
+        """
+        Load a prebuilt index artifact if it is up to date
+        
+        The index is opened with IO_FLAG_MMAP where the index type supports
+        it, so several worker processes share one copy in the page cache.
+        
+        Returns:
+            True if the artifact was loaded, False if it must be rebuilt
+        """
+        if self.is_index_stale(index_dir):
+            print(f"ℹ️ Index artifact in {index_dir} is missing or stale, rebuilding")
+            return False
+        
+        try:
+            index = self._read_index(os.path.join(index_dir, INDEX_FILE))
+            
+            with open(os.path.join(index_dir, KNOWLEDGE_FILE), 'r', encoding='utf-8') as f:
+                knowledge_base = json.load(f)
+            
+            if index.ntotal != len(knowledge_base):
+                print(f"⚠️ Index artifact in {index_dir} is inconsistent, rebuilding")
+                return False
+            
+            self.knowledge_base = knowledge_base
+            partitions = {}
+            for category, ids in self._partition_ids().items():
+                partition_path = os.path.join(index_dir, PARTITIONS_DIR, f"{category}.faiss")
+                partition_index = self._read_index(partition_path)
+                if partition_index.ntotal != len(ids):
+                    print(f"⚠️ Partition {category} in {index_dir} is inconsistent, rebuilding")
+                    self.knowledge_base = []
+                    return False
+                partitions[category] = {'index': partition_index, 'ids': ids}
+            
+            self._load_embedder()
+            self.index = index
+            self.partitions = partitions
+            self.set_search_params()
+            self.version = self._version_stamp()
+            
+            print(f"✅ Loaded FAISS index with {len(self.knowledge_base)} entries from {index_dir}")
+            return True
+        except Exception as e:
+            print(f"❌ Error loading index artifact: {e}")
+            return False
+    
     def retrieve_response(self, query, emotion=None, top_k=3):
         """
         Retrieve best response from RAG knowledge base
         
         Args:
             query: User's question/input
-            emotion: Detected emotion (optional, for filtering)
+            emotion: Detected emotion (optional); routed through
+                EMOTION_CATEGORY_ROUTES to the partition that is searched
             top_k: Number of top results to consider
         
         Returns:
@@ -91,53 +537,141 @@ class EnhancedRAGSystem:
         
         try:
             # Encode query
-            query_embedding = self.embedder.encode([query], convert_to_numpy=True)
+            query_embedding = self.encode_queries([query])
             
-            # Search in FAISS index
-            distances, indices = self.index.search(query_embedding, top_k * 2)  # Get more to filter
+            # Search only the partition the emotion routes to
+            distances, indices = self._search(query_embedding, self.route_emotion(emotion), top_k)
             
-            # Filter by emotion if provided
-            candidates = []
-            for dist, idx in zip(distances[0], indices[0]):
-                if idx < len(self.knowledge_base):
-                    item = self.knowledge_base[idx]
-                    
-                    # If emotion matches category, prioritize it
-                    if emotion and emotion.lower() in item['emotion_category'].lower():
-                        candidates.insert(0, {
-                            'distance': dist,
-                            'item': item
-                        })
-                    else:
-                        candidates.append({
-                            'distance': dist,
-                            'item': item
-                        })
-            
-            # Get best match
-            if candidates:
-                best = candidates[0]['item']
+            return self._best_result(distances[0], indices[0])
+            
+        except Exception as e:
+            print(f"Error retrieving response: {e}")
+        
+        return None
+    
+    def retrieve_many(self, queries, emotions=None, top_k=3, batch_size=64):
+        """
+        Batched version of retrieve_response for bulk scoring
+        
+        All queries are encoded in one embedder.encode call, then each group
+        of queries routed to the same partition is searched with a single
+        index.search over its query matrix.
+        
+        Args:
+            queries: List of user inputs
+            emotions: List of detected emotions (same length), a single
+                emotion applied to every query, or None
+            top_k: Number of top results to consider per query
+            batch_size: Encoder batch size
+        
+        Returns:
+            List with one retrieve_response-style dict (or None) per query
+        """
+        queries = list(queries)
+        if emotions is None or isinstance(emotions, str):
+            emotions = [emotions] * len(queries)
+        else:
+            emotions = list(emotions)
+            if len(emotions) != len(queries):
+                raise ValueError("emotions must match queries in length")
+        
+        if not queries or not self.index or not self.embedder:
+            return [None] * len(queries)
+        
+        try:
+            query_embeddings = self.encode_queries(queries, batch_size=batch_size)
+            
+            groups = {}
+            for i, emotion in enumerate(emotions):
+                groups.setdefault(self.route_emotion(emotion), []).append(i)
+            
+            results = [None] * len(queries)
+            for category, rows in groups.items():
+                distances, indices = self._search(query_embeddings[rows], category, top_k)
+                for j, i in enumerate(rows):
+                    results[i] = self._best_result(distances[j], indices[j])
+            return results
+        except Exception as e:
+            print(f"Error retrieving responses: {e}")
+        
+        return [None] * len(queries)
+    
+    def _search(self, query_embeddings, category, k):
+        """
+        Search one partition (or the global index when category is None)
+        
+        Returns distances and global knowledge base row ids; -1 marks empty slots.
+        """
+        if category is None:
+            return self.index.search(query_embeddings, k)
+        
+        partition = self.partitions[category]
+        distances, local_ids = partition['index'].search(query_embeddings, k)
+        global_ids = np.where(local_ids >= 0, partition['ids'][np.maximum(local_ids, 0)], -1)
+        return distances, global_ids
+    
+    def _best_result(self, distances, indices):
+        """Turn the top hit of one row of search results into a response dict"""
+        for dist, idx in zip(distances, indices):
+            if 0 <= idx < len(self.knowledge_base):
+                best = self.knowledge_base[idx]
                 
                 return {
                     'response': best['bot_response'],
                     'followup': best['bot_followup'],
                     'combined': best['combined_response'],
                     'emotion_category': best['emotion_category'],
-                    'distance': float(candidates[0]['distance']),
-                    'confidence': self._calculate_confidence(candidates[0]['distance'])
+                    'distance': float(dist),
+                    'confidence': self._calculate_confidence(dist)
                 }
-            
-        except Exception as e:
-            print(f"Error retrieving response: {e}")
         
         return None
     
     def _calculate_confidence(self, distance):
         """Calculate confidence score from distance (0-1)"""
+        raw = self.raw_confidence(distance)
+        
+        # Calibrated: estimated probability that the retrieved entry is right
+        if self.calibration:
+            return float(np.interp(raw, self.calibration['raw'], self.calibration['precision']))
+        return raw
+    
+    def raw_confidence(self, distance):
+        """Uncalibrated 0-1 score for a FAISS distance/similarity"""
+        if self.metric == "ip":
+            # Cosine similarity of unit vectors
+            return float(max(0, min(1, distance)))
+        
         # Lower distance = higher confidence
         # Typical distances range from 0 to 2
         confidence = max(0, min(1, 1 - (distance / 2)))
-        return confidence
+        return float(confidence)
+    
+    def confidence_threshold(self, default):
+        """Lowest confidence that trusts a RAG hit (inclusive): calibrated if available, else default"""
+        if self.calibration and self.calibration.get('threshold') is not None:
+            return self.calibration['threshold']
+        return default
+    
+    def _load_calibration(self, calibration_path):
+        """Read a calibration file, ignoring it if it was made for another setup"""
+        if not calibration_path or not os.path.exists(calibration_path):
+            return None
+        
+        try:
+            with open(calibration_path, 'r', encoding='utf-8') as f:
+                calibration = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Could not read calibration {calibration_path}: {e}")
+            return None
+        
+        if (calibration.get('model') != self.model_name or calibration.get('metric') != self.metric
+                or calibration.get('fp16') != self.fp16 or calibration.get('index_type') != self.index_type):
+            print(f"⚠️ Calibration {calibration_path} was made for another model/index setup, ignoring it")
+            return None
+        
+        print(f"✅ Loaded confidence calibration (threshold {calibration.get('threshold')})")
+        return calibration
 
 
 # ==================== INTEGRATION WITH MAIN APP ====================
@@ -158,12 +692,12 @@ def get_enhanced_response(user_input, emotion, rag_system):
     # Try RAG knowledge base first
     rag_result = rag_system.retrieve_response(user_input, emotion, top_k=3)
     
-    if rag_result and rag_result['confidence'] > 0.6:  # Good match
+    if rag_result and rag_result['confidence'] >= rag_system.confidence_threshold(0.6):  # Good match
         # Use RAG response
         return rag_result['combined']
     
-    # Fallback to contextual responses (from chatbot_responses.py)
-    from chatbot_responses import get_response
+    # Fallback to contextual responses (from chatbot_reponses.py)
+    from chatbot_reponses import get_response
     return get_response(user_input, emotion)
 
 
@@ -0,0 +1,432 @@
+"""
+face_emotion.py
+In-memory face emotion analysis on camera frames
+
+Replaces DeepFace.analyze(img_path=...) for the live camera: frames stay
+numpy arrays (no temp JPEG written and decoded again), the face detector
+and DeepFace's emotion model are built once, and several frames can be
+classified in one model call.
+
+FaceEmotionPool shares one analyzer between all camera sessions: a fixed
+number of worker threads, at most one queued frame per client (a newer
+frame replaces the older one) and clients served round-robin in batches.
+
+Per session, DetectionScheduler decides when a frame is worth sending
+(time budget + cheap change detection) and EmotionSmoother stabilizes the
+label shown to the user.
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Output order of DeepFace's facial expression model
+EMOTION_LABELS = ("angry", "disgust", "fear", "happy", "sad", "surprise", "neutral")
+
+EMOTION_INPUT_SIZE = 48
+
+
+class FaceEmotionAnalyzer:
+    """
+    Haar-cascade face crop + DeepFace emotion model, run directly on arrays
+
+    analyze() returns the same shape of result as DeepFace.analyze
+    (dominant_emotion, emotion percentages, region), so callers don't change.
+    """
+
+    def __init__(self, min_face_size=60):
+        """
+        Args:
+            min_face_size: Smallest face (pixels) the detector reports
+        """
+        import cv2
+        from deepface import DeepFace
+
+        self._cv2 = cv2
+        self.min_face_size = min_face_size
+        self.detector = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+
+        # Newer DeepFace versions wrap the Keras model in a client object
+        model = DeepFace.build_model("Emotion")
+        self.model = getattr(model, "model", model)
+
+    def detect_face(self, gray):
+        """
+        Largest face in a grayscale frame
+
+        Returns:
+            (x, y, w, h), or None when no face is found
+        """
+        faces = self.detector.detectMultiScale(
+            gray, scaleFactor=1.1, minNeighbors=5,
+            minSize=(self.min_face_size, self.min_face_size)
+        )
+        if len(faces) == 0:
+            return None
+        x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+        return int(x), int(y), int(w), int(h)
+
+    def preprocess(self, frame, region=None):
+        """
+        Crop, grayscale and resize one BGR frame to the model's input
+
+        Without a face region the whole frame is used, like DeepFace with
+        enforce_detection=False.
+
+        Returns:
+            (face array of shape 48x48x1 in [0, 1], region dict)
+        """
+        cv2 = self._cv2
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+        if region is None:
+            region = self.detect_face(gray)
+        if region is None:
+            region = (0, 0, gray.shape[1], gray.shape[0])
+
+        x, y, w, h = region
+        face = cv2.resize(gray[y:y + h, x:x + w], (EMOTION_INPUT_SIZE, EMOTION_INPUT_SIZE))
+        face = face.astype(np.float32)[:, :, np.newaxis] / 255.0
+        return face, {'x': x, 'y': y, 'w': w, 'h': h}
+
+    def predict(self, faces):
+        """
+        Emotion probabilities for preprocessed faces
+
+        Args:
+            faces: Array of shape (N, 48, 48, 1)
+
+        Returns:
+            Array of shape (N, 7), rows in EMOTION_LABELS order
+        """
+        # Calling the model directly avoids predict()'s per-call setup cost
+        probabilities = np.asarray(self.model(faces, training=False))
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    def analyze_batch(self, frames, regions=None):
+        """Analyze several BGR frames with one model call"""
+        if not frames:
+            return []
+        if regions is None:
+            regions = [None] * len(frames)
+
+        faces, boxes = zip(*(self.preprocess(frame, region) for frame, region in zip(frames, regions)))
+        probabilities = self.predict(np.stack(faces))
+
+        results = []
+        for row, box in zip(probabilities, boxes):
+            emotion = {label: float(p * 100) for label, p in zip(EMOTION_LABELS, row)}
+            results.append({
+                'dominant_emotion': EMOTION_LABELS[int(np.argmax(row))],
+                'emotion': emotion,
+                'region': box,
+            })
+        return results
+
+    def analyze(self, frame, region=None):
+        """
+        Analyze one BGR frame
+
+        Returns:
+            {"dominant_emotion", "emotion": {label: percent}, "region": {...}}
+        """
+        return self.analyze_batch([frame], [region])[0]
+
+
+class FaceEmotionPool:
+    """
+    Process-wide, bounded face emotion inference
+
+    Sessions submit frames under a client id and later collect the newest
+    result from the Streamlit script thread; nothing here touches
+    st.session_state. CPU use is capped by the worker count no matter how
+    many cameras are open, and the queue holds at most one frame per client.
+
+    Results are only kept for live clients: a client that was forgotten, or
+    that has neither submitted nor collected for client_ttl seconds (its
+    session went away), has its finished frames dropped.
+    """
+
+    def __init__(self, analyzer, workers=1, max_batch_size=8, latency_window=1000, client_ttl=60.0):
+        """
+        Args:
+            analyzer: FaceEmotionAnalyzer shared by all workers
+            workers: Inference threads (each runs one batch at a time)
+            max_batch_size: Most clients served in one model call
+            latency_window: Number of recent frames kept for percentiles
+            client_ttl: Seconds without submit/take_result after which a
+                client counts as abandoned
+        """
+        self.analyzer = analyzer
+        self.max_batch_size = max_batch_size
+        self.client_ttl = client_ttl
+
+        self._pending = {}      # client id -> (frame, region, submitted_at), newest only
+        self._order = deque()   # client ids waiting, oldest first (round-robin)
+        self._results = {}      # client id -> result not yet collected
+        self._clients = {}      # live client id -> last submit/take_result (perf_counter)
+        self._cond = threading.Condition()
+        self._stopped = False
+
+        self._latencies = deque(maxlen=latency_window)
+        self._batch_sizes = deque(maxlen=latency_window)
+        self.submitted = 0
+        self.superseded = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.in_flight = 0
+
+        self._workers = [
+            threading.Thread(target=self._run, name=f"face-emotion-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    # ==================== PUBLIC API ====================
+
+    def submit(self, client_id, frame, region=None):
+        """
+        Queue a frame for a client, replacing any frame still waiting
+
+        Args:
+            region: Face box (x, y, w, h) if already known (e.g. tracked);
+                None lets the analyzer detect it
+
+        Returns:
+            False if an older frame from this client was dropped
+        """
+        with self._cond:
+            self.submitted += 1
+            self._clients[client_id] = time.perf_counter()
+            fresh = client_id not in self._pending
+            if fresh:
+                self._order.append(client_id)
+            else:
+                self.superseded += 1
+            self._pending[client_id] = (frame, region, time.perf_counter())
+            self._cond.notify()
+            return fresh
+
+    def take_result(self, client_id):
+        """Newest finished result for a client (once), or None"""
+        with self._cond:
+            if client_id in self._clients:
+                self._clients[client_id] = time.perf_counter()
+            return self._results.pop(client_id, None)
+
+    def is_pending(self, client_id):
+        """True while a frame from this client waits for a worker"""
+        with self._cond:
+            return client_id in self._pending
+
+    def forget(self, client_id):
+        """Drop a client's queued frame, uncollected result and in-flight frames (camera stopped)"""
+        with self._cond:
+            if self._pending.pop(client_id, None) is not None:
+                self._order.remove(client_id)
+            self._results.pop(client_id, None)
+            self._clients.pop(client_id, None)
+
+    def stats(self):
+        """Backpressure and latency counters for monitoring"""
+        with self._cond:
+            latencies = np.array(self._latencies)
+            batch_sizes = np.array(self._batch_sizes)
+            stats = {
+                'workers': len(self._workers),
+                'queue_depth': len(self._pending),
+                'in_flight': self.in_flight,
+                'submitted': self.submitted,
+                'superseded': self.superseded,
+                'processed': self.processed,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'clients': len(self._clients),
+            }
+
+        stats['p50_ms'] = float(np.percentile(latencies, 50) * 1000) if len(latencies) else None
+        stats['p99_ms'] = float(np.percentile(latencies, 99) * 1000) if len(latencies) else None
+        stats['avg_batch_size'] = float(batch_sizes.mean()) if len(batch_sizes) else None
+        return stats
+
+    def close(self):
+        """Stop the worker threads"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    # ==================== WORKERS ====================
+
+    def _expire_clients(self, now):
+        """Forget clients idle for longer than client_ttl (caller holds the lock)"""
+        for client_id, seen in list(self._clients.items()):
+            if now - seen > self.client_ttl and client_id not in self._pending:
+                del self._clients[client_id]
+                self._results.pop(client_id, None)
+
+    def _next_batch(self):
+        """Wait for work, then take one frame from each of the oldest clients"""
+        with self._cond:
+            while not self._order and not self._stopped:
+                self._cond.wait()
+            if self._stopped:
+                return []
+
+            batch = []
+            while self._order and len(batch) < self.max_batch_size:
+                client_id = self._order.popleft()
+                frame, region, submitted_at = self._pending.pop(client_id)
+                batch.append((client_id, frame, region, submitted_at))
+            self.in_flight += len(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+
+            try:
+                results = self.analyzer.analyze_batch([item[1] for item in batch], [item[2] for item in batch])
+            except Exception as e:
+                print(f"⚠️ Face emotion batch failed: {e}")
+                results = None
+
+            done = time.perf_counter()
+            with self._cond:
+                self.in_flight -= len(batch)
+                self._batch_sizes.append(len(batch))
+                if results is None:
+                    self.failed += len(batch)
+                    continue
+                self._expire_clients(done)
+                for (client_id, _, _, submitted_at), result in zip(batch, results):
+                    self._latencies.append(done - submitted_at)
+                    if client_id not in self._clients:
+                        # Forgotten or abandoned while its frame was in flight
+                        self.dropped += 1
+                        continue
+                    result['finished_at'] = time.time()
+                    self._results[client_id] = result
+                self.processed += len(batch)
+
+
+class DetectionScheduler:
+    """
+    Decides per camera frame whether to run face emotion detection
+
+    Detection runs at most target_hz times a second, and only when the scene
+    changed since the last detected frame (mean absolute difference of small
+    grayscale thumbnails) or the last result is older than max_age seconds.
+    """
+
+    def __init__(self, target_hz=1.0, max_age=5.0, change_threshold=6.0, thumb_size=(32, 24)):
+        """
+        Args:
+            target_hz: Most detections per second
+            max_age: Seconds after which a result is refreshed even if
+                nothing changed
+            change_threshold: Mean absolute grey-level difference (0-255)
+                that counts as a change
+            thumb_size: (width, height) of the comparison thumbnails
+        """
+        self.min_interval = 1.0 / target_hz
+        self.max_age = max_age
+        self.change_threshold = change_threshold
+        self.thumb_size = thumb_size
+
+        self._last_run = None
+        self._last_thumb = None
+        self.runs = 0
+        self.skipped_unchanged = 0
+
+    def _thumbnail(self, frame):
+        import cv2
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.resize(gray, self.thumb_size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def should_detect(self, frame, now=None):
+        """True if this frame should be sent for detection (and records it)"""
+        now = time.monotonic() if now is None else now
+        if self._last_run is not None and now - self._last_run < self.min_interval:
+            return False
+
+        thumb = self._thumbnail(frame)
+        stale = self._last_run is None or now - self._last_run >= self.max_age
+        changed = (self._last_thumb is None
+                   or np.abs(thumb - self._last_thumb).mean() >= self.change_threshold)
+        if not (stale or changed):
+            self.skipped_unchanged += 1
+            return False
+
+        self._record(thumb, now)
+        return True
+
+    def mark(self, frame, now=None):
+        """Record a detection triggered outside the schedule (e.g. a button)"""
+        self._record(self._thumbnail(frame), time.monotonic() if now is None else now)
+
+    def _record(self, thumb, now):
+        self._last_run = now
+        self._last_thumb = thumb
+        self.runs += 1
+
+
+class EmotionSmoother:
+    """Averages emotion percentages over the last few detections"""
+
+    def __init__(self, window=5):
+        self._history = deque(maxlen=window)
+
+    def update(self, emotion):
+        """
+        Args:
+            emotion: {label: percent} from an analyzer result
+
+        Returns:
+            (label, confidence in [0, 1]) of the rolling average
+        """
+        self._history.append(np.array([emotion.get(label, 0.0) for label in EMOTION_LABELS]))
+        mean = np.mean(self._history, axis=0)
+        best = int(np.argmax(mean))
+        return EMOTION_LABELS[best], float(mean[best] / 100.0)
+
+    def reset(self):
+        self._history.clear()
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import tempfile
+
+    import cv2
+
+    # Compare against the old write-JPEG-then-analyze path
+    frame = cv2.imread(sys.argv[1]) if len(sys.argv) > 1 else np.random.randint(0, 255, (480, 640, 3), np.uint8)
+    analyzer = FaceEmotionAnalyzer()
+    analyzer.analyze(frame)  # warm-up
+
+    runs = 20
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = analyzer.analyze(frame)
+    in_memory = (time.perf_counter() - start) / runs
+    print(f"In-memory: {in_memory * 1000:.1f} ms/frame -> {result['dominant_emotion']}")
+
+    from deepface import DeepFace
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        tmp_path = os.path.join(tempfile.gettempdir(), "emotion_bench.jpg")
+        cv2.imwrite(tmp_path, frame)
+        DeepFace.analyze(img_path=tmp_path, actions=["emotion"], enforce_detection=False,
+                         detector_backend="opencv", silent=True)
+        os.unlink(tmp_path)
+    temp_file = (time.perf_counter() - start) / runs
+    print(f"Temp file: {temp_file * 1000:.1f} ms/frame")
@@ -0,0 +1,119 @@
+"""
+health.py
+Readiness probe for MindSync app processes
+
+Usage:
+    python health.py --port 8501     # exit 0 when that instance is ready
+    python health.py                 # exit 0 when every instance on this host is ready
+    python health.py --max-age 600   # report warm-up stuck for over 10 minutes
+
+Each app process rewrites .model_status.<port>.json (in MINDSYNC_STATUS_DIR)
+on every warm-up status change, so probing never imports Streamlit or any
+model. Files left behind by a process that is no longer running are
+reported and ignored.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+STATUS_DIR = os.environ.get("MINDSYNC_STATUS_DIR", ".")
+
+
+def status_file_for(port, status_dir=STATUS_DIR):
+    """Same naming as model_registry.status_file_for (kept here so probing stays import-free)"""
+    return os.path.join(status_dir, f".model_status.{port}.json")
+
+
+def read_health(status_file):
+    """
+    Returns:
+        The registry's health() summary, or None if no status was written yet
+    """
+    try:
+        with open(status_file, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _pid_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError, TypeError):
+        # Exists but owned by someone else, or unknown
+        return True
+    return True
+
+
+def check_instance(status_file, max_age=None):
+    """
+    Print one instance's components and decide whether it is ready
+
+    Returns:
+        True if ready, False if not, None if its process is gone
+    """
+    health = read_health(status_file)
+    if health is None:
+        print(f"❌ No status at {status_file} (app not started?)")
+        return False
+
+    label = f"port {health.get('port')}" if health.get('port') else status_file
+    if not _pid_running(health.get('pid')):
+        print(f"ℹ️ {label}: process {health.get('pid')} is not running, ignoring")
+        return None
+
+    print(f"{label} (pid {health.get('pid')}):")
+    for name, component in health['components'].items():
+        seconds = f" ({component['seconds']:.1f}s)" if component['seconds'] is not None else ""
+        error = f": {component['error']}" if component['error'] else ""
+        print(f"   {name}: {component['status']}{seconds}{error}")
+
+    if max_age is not None:
+        age = time.time() - os.path.getmtime(status_file)
+        if age > max_age and not health['ready']:
+            print(f"❌ {label}: warm-up has not progressed for {age:.0f}s")
+            return False
+
+    if health['ready']:
+        if health.get('failed'):
+            print(f"⚠️ {label}: ready in keyword-only mode for: {', '.join(health['failed'])}")
+        else:
+            print(f"✅ {label}: ready")
+        return True
+
+    print(f"⚠️ {label}: warming up")
+    return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check whether MindSync is ready to take traffic")
+    parser.add_argument("--port", type=int, default=None, help="Only check the instance serving this port")
+    parser.add_argument("--status-dir", default=STATUS_DIR, help="Directory the app writes status files to")
+    parser.add_argument("--max-age", type=float, default=None,
+                        help="Seconds a warm-up may go without progress before it counts as stuck")
+    args = parser.parse_args(argv)
+
+    if args.port is not None:
+        return 0 if check_instance(status_file_for(args.port, args.status_dir), args.max_age) else 1
+
+    files = sorted(glob.glob(os.path.join(args.status_dir, ".model_status.*.json")))
+    if not files:
+        print(f"❌ No status files in {args.status_dir} (app not started?)")
+        return 1
+
+    results = [check_instance(path, args.max_age) for path in files]
+    live = [ready for ready in results if ready is not None]
+    if not live:
+        print("❌ No running instances")
+        return 1
+    return 0 if all(live) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""
+model_registry.py
+Lazy, process-wide registry for the app's heavy models
+
+Nothing heavy is imported when this module (or app.py) is imported: each
+model's loader runs the first time a page asks for it, and the time it
+took is recorded for the startup report.
+
+At process start the models listed in MINDSYNC_WARMUP are loaded on
+background threads. Pages use get_if_ready() so they degrade to keyword
+mode instead of blocking while a model is still warming, and every status
+change is written to a small JSON file read by health.py. Each app process
+has its own file, named after the port it serves
+(.model_status.<port>.json in MINDSYNC_STATUS_DIR).
+"""
+
+import datetime
+import json
+import os
+import threading
+import time
+
+import streamlit as st
+
+# Comma-separated models to preload at process start ("" = load on demand only).
+# Only the RAG index by default: the text classifier (transformers) and the
+# face model (TensorFlow) load when a page first needs them, unless a
+# deployment lists them in MINDSYNC_WARMUP
+DEFAULT_WARMUP = "rag"
+
+STATUS_DIR = os.environ.get("MINDSYNC_STATUS_DIR", ".")
+
+
+def status_file_for(port, status_dir=STATUS_DIR):
+    """Status file of the app process serving the given port"""
+    return os.path.join(status_dir, f".model_status.{port}.json")
+
+PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "failed"
+
+
+class ModelRegistry:
+    """Loads each registered model once, on first use, and times it"""
+
+    def __init__(self, status_file=None, port=None):
+        self._loaders = {}
+        self._models = {}
+        self._status = {}
+        self._timings = {}   # name -> seconds spent loading/importing
+        self._errors = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._status_file_lock = threading.Lock()
+        self._warmup = []
+        self.status_file = status_file
+        self.port = port
+
+    def register(self, name, loader):
+        """Register a zero-argument loader; re-registering a name is a no-op"""
+        with self._lock:
+            if name not in self._loaders:
+                self._loaders[name] = loader
+                self._locks[name] = threading.Lock()
+                self._status[name] = PENDING
+
+    def get(self, name):
+        """Return the model, loading it first if needed (thread-safe)"""
+        if name in self._models:
+            return self._models[name]
+
+        if name not in self._loaders:
+            raise KeyError(f"No model registered as {name!r}")
+
+        with self._locks[name]:
+            # Another thread may have finished loading while we waited
+            if name in self._models:
+                return self._models[name]
+
+            self._set_status(name, LOADING)
+            start = time.perf_counter()
+            try:
+                model = self._loaders[name]()
+            except Exception as e:
+                self._errors[name] = str(e)
+                self._timings[name] = time.perf_counter() - start
+                self._set_status(name, FAILED)
+                raise
+
+            self._timings[name] = time.perf_counter() - start
+            self._errors.pop(name, None)
+            self._models[name] = model
+            self._set_status(name, READY)
+            print(f"✅ Loaded {name} in {self._timings[name]:.2f}s")
+            return model
+
+    def get_if_ready(self, name):
+        """
+        Non-blocking get: the model if loaded, else None
+
+        A model that has not started loading is kicked off in the background,
+        so on-demand pages never wait on the first load either.
+        """
+        if name in self._models:
+            return self._models[name]
+        if self._status.get(name) == PENDING:
+            self._load_in_background(name)
+        return None
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def error(self, name):
+        """Why the model failed to load, or None if it hasn't failed"""
+        if self._status.get(name) != FAILED:
+            return None
+        return self._errors.get(name, "unknown error")
+
+    # ==================== WARM-UP & READINESS ====================
+
+    def warm_up(self, names):
+        """Start loading the given models on background threads"""
+        for name in names:
+            if name not in self._loaders:
+                print(f"⚠️ Unknown model in warm-up list: {name}")
+                continue
+            if name not in self._warmup:
+                self._warmup.append(name)
+            self._load_in_background(name)
+        self._write_status()
+
+    def _load_in_background(self, name):
+        with self._lock:
+            if self._status.get(name) != PENDING:
+                return
+            # Claim it so concurrent callers don't start a second thread
+            self._status[name] = LOADING
+
+        def load():
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"❌ Failed to load {name}: {e}")
+
+        threading.Thread(target=load, name=f"warmup-{name}", daemon=True).start()
+
+    def status(self):
+        """Per-component readiness: pending / loading / ready / failed"""
+        return dict(self._status)
+
+    def is_ready(self):
+        """
+        True once every warm-up component has finished loading
+
+        A component that failed counts as finished: its pages stay in
+        keyword-only mode and health() lists it under 'failed'.
+        """
+        return all(self._status.get(name) in (READY, FAILED) for name in self._warmup)
+
+    def health(self):
+        """Small JSON-able readiness summary for probes"""
+        return {
+            'ready': self.is_ready(),
+            'warmup': list(self._warmup),
+            'failed': [name for name, status in self._status.items() if status == FAILED],
+            'components': {
+                name: {
+                    'status': status,
+                    'seconds': round(self._timings[name], 3) if name in self._timings else None,
+                    'error': self._errors.get(name),
+                }
+                for name, status in self._status.items()
+            },
+            'pid': os.getpid(),
+            'port': self.port,
+            'updated_at': datetime.datetime.utcnow().isoformat() + "Z",
+        }
+
+    def _set_status(self, name, status):
+        with self._lock:
+            self._status[name] = status
+        self._write_status()
+
+    def _write_status(self):
+        """Publish health() for out-of-process probes (health.py)"""
+        if not self.status_file:
+            return
+        with self._status_file_lock:
+            try:
+                tmp_path = f"{self.status_file}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self.health(), f, indent=2)
+                os.replace(tmp_path, self.status_file)
+            except Exception as e:
+                print(f"⚠️ Could not write model status: {e}")
+
+    def record(self, name, seconds):
+        """Record a non-model startup phase (e.g. imports) once"""
+        with self._lock:
+            self._timings.setdefault(name, seconds)
+
+    def report(self):
+        """Startup-time breakdown: one row per component"""
+        rows = []
+        for name in list(self._timings) + [n for n in self._loaders if n not in self._timings]:
+            status = self._status.get(name, "done")
+            rows.append({
+                'component': name,
+                'status': status,
+                'seconds': round(self._timings[name], 3) if name in self._timings else None,
+                'error': self._errors.get(name),
+            })
+        return rows
+
+
+# ==================== LOADERS ====================
+# Imports live inside the loaders so importing this module stays cheap
+
+def _load_rag():
+    from enhanced_rag_system import EnhancedRAGSystem
+
+    return EnhancedRAGSystem(
+        rag_directory="rag_knowledges",
+        index_dir="rag_index",
+        metric="ip",
+        fp16=True,
+        calibration_path="rag_calibration.json"
+    )
+
+
+def _load_emotion_classifier():
+    from emotion_service import EmotionInferenceService
+
+    # Shared by all sessions; concurrent requests are micro-batched
+    return EmotionInferenceService(
+        model_name="j-hartmann/emotion-english-distilroberta-base",
+        backend="int8",
+        max_batch_size=16,
+        max_wait_ms=5
+    )
+
+
+def _load_face_emotion():
+    # Pulls in TensorFlow; only the Virtual Chat page needs it
+    from face_emotion import FaceEmotionAnalyzer, FaceEmotionPool
+
+    # One bounded pool serves every camera session in the process
+    return FaceEmotionPool(FaceEmotionAnalyzer(), workers=1, max_batch_size=8)
+
+
+@st.cache_resource
+def get_registry():
+    """Process-wide registry shared by every session; starts the warm-up"""
+    port = st.get_option("server.port")
+    registry = ModelRegistry(status_file=status_file_for(port), port=port)
+    registry.register("rag", _load_rag)
+    registry.register("emotion_classifier", _load_emotion_classifier)
+    registry.register("face_emotion", _load_face_emotion)
+
+    warmup = os.environ.get("MINDSYNC_WARMUP", DEFAULT_WARMUP)
+    registry.warm_up([name.strip() for name in warmup.split(",") if name.strip()])
+    return registry
@@ -7,6 +7,9 @@ import plotly.graph_objects as go
 import calendar
 
 from db import get_db
+from repositories import repository
+import daily_stats
+import streaks
 
 db = get_db()
 
@@ -18,6 +21,14 @@ exercises_col = db["exercises"]
 achievements_col = db["achievements"]
 reminders_col = db["reminders"]
 
+# Projected reads (see repositories.py)
+sessions_repo = repository(db["sessions"])
+mood_journal_repo = repository(mood_journal_col)
+goals_repo = repository(goals_col)
+exercises_repo = repository(exercises_col)
+achievements_repo = repository(achievements_col)
+reminders_repo = repository(reminders_col)
+
 # -------------------- 🗓️ MOOD JOURNAL --------------------
 def mood_journal_page(username):
     st.title("🗓️ Daily Mood Journal")
@@ -98,10 +109,10 @@ def new_mood_entry(username):
             }
             
             # Check if entry exists for today
-            existing = mood_journal_col.find_one({
+            existing = mood_journal_repo.find_one({
                 "username": username,
                 "date": entry["date"]
-            })
+            }, ["_id"])
             
             if existing:
                 mood_journal_col.update_one(
@@ -112,16 +123,21 @@ def new_mood_entry(username):
             else:
                 mood_journal_col.insert_one(entry)
                 st.success("✅ Entry saved successfully!")
-                
-                # Check for streak achievement
-                check_journal_streak(username)
+            
+            daily_stats.record_journal(db, username, entry["mood"], entry["mood_score"], entry["timestamp"])
+            streaks.record(db, username, "journal", entry["timestamp"], user_timezone())
+            
+            # Check for streak achievement (a no-op when it is already unlocked)
+            check_journal_streak(username)
             
             st.rerun()
 
 def mood_history(username):
-    entries = list(mood_journal_col.find(
-        {"username": username}
-    ).sort("timestamp", -1).limit(30))
+    entries = mood_journal_repo.find(
+        {"username": username},
+        ["timestamp", "mood_score", "mood", "emotions", "notes", "triggers"],
+        sort=[("timestamp", -1)], limit=30
+    )
     
     if not entries:
         st.info("📝 No entries yet. Start journaling to see your history!")
@@ -191,18 +207,14 @@ def mood_heatmap(username):
     end_date = datetime.datetime.utcnow()
     start_date = end_date - datetime.timedelta(days=90)
     
-    entries = list(mood_journal_col.find({
-        "username": username,
-        "timestamp": {"$gte": start_date}
-    }))
+    journal_days = daily_stats.days(db, username, ["day", "mood_score"], since=start_date, journal=True)
     
-    if not entries:
+    if not journal_days:
         st.info("📅 Start journaling to see your mood heatmap!")
         return
     
     # Create heatmap data
-    df = pd.DataFrame(entries)
-    df['date'] = pd.to_datetime(df['timestamp']).dt.date
+    scores = {row['day'].date(): row.get('mood_score') or 0 for row in journal_days}
     
     # Generate calendar grid
     today = datetime.date.today()
@@ -211,8 +223,7 @@ def mood_heatmap(username):
     heatmap_data = []
     for date in dates:
         date_str = date.date()
-        entry = df[df['date'] == date_str]
-        score = entry['mood_score'].values[0] if len(entry) > 0 else 0
+        score = scores.get(date_str, 0)
         
         heatmap_data.append({
             'date': date_str,
@@ -332,10 +343,10 @@ def create_goal(username):
         """)
 
 def display_goals(username):
-    goals = list(goals_col.find({
+    goals = goals_repo.find({
         "username": username,
         "status": "active"
-    }))
+    }, ["_id", "name", "current", "target", "frequency"])
     
     if not goals:
         st.info("🎯 No active goals. Create your first goal to get started!")
@@ -448,7 +459,7 @@ def breathing_exercise(username):
         
         if st.button("▶️ Start Exercise", use_container_width=True):
             # Log exercise completion
-            exercises_col.insert_one({
+            log_exercise({
                 "username": username,
                 "type": "breathing",
                 "exercise": exercise_type,
@@ -517,7 +528,7 @@ def thought_record(username):
                 "timestamp": datetime.datetime.utcnow()
             }
             
-            exercises_col.insert_one(record)
+            log_exercise(record)
             st.success("✅ Thought record saved!")
             unlock_achievement(username, "thought_challenger")
 
@@ -547,7 +558,7 @@ def gratitude_journal(username):
                 "timestamp": datetime.datetime.utcnow()
             }
             
-            exercises_col.insert_one(entry)
+            log_exercise(entry)
             st.success("✅ Gratitude entry saved!")
             unlock_achievement(username, "gratitude_warrior")
     
@@ -555,10 +566,10 @@ def gratitude_journal(username):
     st.markdown("---")
     st.markdown("### 📖 Recent Entries")
     
-    recent = list(exercises_col.find({
+    recent = exercises_repo.find({
         "username": username,
         "type": "gratitude"
-    }).sort("timestamp", -1).limit(5))
+    }, ["timestamp", "items"], sort=[("timestamp", -1)], limit=5)
     
     for entry in recent:
         with st.expander(entry['timestamp'].strftime('%b %d, %Y')):
@@ -604,7 +615,7 @@ def cbt_worksheet(username):
                 "timestamp": datetime.datetime.utcnow()
             }
             
-            exercises_col.insert_one(worksheet)
+            log_exercise(worksheet)
             st.success("✅ CBT worksheet saved!")
 
 # -------------------- 🏆 GAMIFICATION --------------------
@@ -668,7 +679,7 @@ def display_achievements(username):
     }
     
     # Get user's achievements
-    user_achievements = list(achievements_col.find({"username": username}))
+    user_achievements = achievements_repo.find({"username": username}, ["achievement_id"])
     unlocked_ids = [a['achievement_id'] for a in user_achievements]
     
     # Calculate total points
@@ -720,13 +731,16 @@ def display_achievements(username):
             
             st.markdown("<br>", unsafe_allow_html=True)
 
+TIMELINE_LENGTH = 20
+
 def display_statistics(username):
     # Gather all user data
-    total_chats = db["sessions"].count_documents({"username": username})
-    total_journal = mood_journal_col.count_documents({"username": username})
-    total_goals = goals_col.count_documents({"username": username})
-    completed_goals = goals_col.count_documents({"username": username, "status": "completed"})
-    total_exercises = exercises_col.count_documents({"username": username})
+    totals = daily_stats.totals(db, username)
+    total_chats = totals["messages"]
+    total_journal = totals["journal_days"]  # one journal entry per day
+    total_goals = goals_repo.count({"username": username})
+    completed_goals = goals_repo.count({"username": username, "status": "completed"})
+    total_exercises = totals["exercises"]
     
     # Display comprehensive stats
     st.subheader("📊 Your Wellness Statistics")
@@ -753,11 +767,13 @@ def display_statistics(username):
     st.markdown("---")
     st.subheader("📈 Activity Timeline")
     
-    # Combine all activities
+    # Combine all activities: only the newest TIMELINE_LENGTH of each kind
+    # can make the merged timeline, so that's all each query fetches
     activities = []
     
     # Chats
-    for chat in db["sessions"].find({"username": username}).limit(100):
+    for chat in sessions_repo.find({"username": username}, ["timestamp"],
+                                   sort=[("timestamp", -1)], limit=TIMELINE_LENGTH):
         activities.append({
             "date": chat["timestamp"],
             "type": "Chat",
@@ -765,7 +781,8 @@ def display_statistics(username):
         })
     
     # Journal
-    for entry in mood_journal_col.find({"username": username}).limit(100):
+    for entry in mood_journal_repo.find({"username": username}, ["timestamp", "mood"],
+                                        sort=[("timestamp", -1)], limit=TIMELINE_LENGTH):
         activities.append({
             "date": entry["timestamp"],
             "type": "Journal",
@@ -773,7 +790,8 @@ def display_statistics(username):
         })
     
     # Goals
-    for goal in goals_col.find({"username": username}).limit(100):
+    for goal in goals_repo.find({"username": username}, ["created_at", "name"],
+                                sort=[("created_at", -1)], limit=TIMELINE_LENGTH):
         activities.append({
             "date": goal["created_at"],
             "type": "Goal",
@@ -781,7 +799,8 @@ def display_statistics(username):
         })
     
     # Exercises
-    for exercise in exercises_col.find({"username": username}).limit(100):
+    for exercise in exercises_repo.find({"username": username}, ["timestamp", "type"],
+                                        sort=[("timestamp", -1)], limit=TIMELINE_LENGTH):
         activities.append({
             "date": exercise["timestamp"],
             "type": "Exercise",
@@ -792,62 +811,36 @@ def display_statistics(username):
     activities.sort(key=lambda x: x["date"], reverse=True)
     
     # Display timeline
-    for activity in activities[:20]:
+    for activity in activities[:TIMELINE_LENGTH]:
         st.markdown(f"**{activity['date'].strftime('%b %d, %I:%M %p')}** - {activity['type']}: {activity['description']}")
 
+def log_exercise(entry):
+    """Save a completed exercise and count it in the daily rollup"""
+    exercises_col.insert_one(entry)
+    daily_stats.record_exercise(db, entry["username"], entry["type"], entry["timestamp"])
+
 def unlock_achievement(username, achievement_id):
     """Unlock an achievement for a user"""
-    existing = achievements_col.find_one({
-        "username": username,
-        "achievement_id": achievement_id
-    })
-    
-    if not existing:
-        achievements_col.insert_one({
-            "username": username,
-            "achievement_id": achievement_id,
-            "unlocked_at": datetime.datetime.utcnow()
-        })
+    # Upsert on the unique (username, achievement_id) index: one round trip,
+    # and two sessions unlocking at once can't create a duplicate
+    achievements_col.update_one(
+        {"username": username, "achievement_id": achievement_id},
+        {"$setOnInsert": {"unlocked_at": datetime.datetime.utcnow()}},
+        upsert=True
+    )
+
+def user_timezone():
+    """The logged-in user's IANA timezone, for local-day streaks"""
+    return st.session_state.get("timezone", streaks.DEFAULT_TIMEZONE)
 
 def check_journal_streak(username):
     """Check and award streak achievements"""
-    entries = list(mood_journal_col.find(
-        {"username": username}
-    ).sort("timestamp", -1).limit(30))
-    
-    if len(entries) >= 7:
-        dates = [e['timestamp'].date() for e in entries]
-        dates.sort(reverse=True)
-        
-        streak = 1
-        for i in range(len(dates) - 1):
-            if (dates[i] - dates[i + 1]).days == 1:
-                streak += 1
-            else:
-                break
-        
-        if streak >= 7:
-            unlock_achievement(username, "journal_streak_7")
+    if streaks.get(db, username, "journal", user_timezone())["current"] >= 7:
+        unlock_achievement(username, "journal_streak_7")
 
 def calculate_login_streak(username):
-    """Calculate consecutive login days"""
-    sessions = list(db["sessions"].find(
-        {"username": username}
-    ).sort("timestamp", -1))
-    
-    if not sessions:
-        return 0
-    
-    dates = sorted(set([s['timestamp'].date() for s in sessions]), reverse=True)
-    
-    streak = 1
-    for i in range(len(dates) - 1):
-        if (dates[i] - dates[i + 1]).days == 1:
-            streak += 1
-        else:
-            break
-    
-    return streak
+    """Consecutive local days with at least one chat message"""
+    return streaks.get(db, username, "login", user_timezone())["current"]
 
 # -------------------- 🔔 REMINDERS (Browser Notifications) --------------------
 # ==================== ENHANCED REMINDERS PAGE ====================
@@ -899,7 +892,7 @@ def reminders_page(username):
     st.markdown("Get reminded to log your mood every day")
     
     # Get existing settings
-    existing_checkin = reminders_col.find_one({"username": username, "type": "checkin"})
+    existing_checkin = reminders_repo.find_one({"username": username, "type": "checkin"}, ["enabled", "time"])
     
     col1, col2 = st.columns([2, 1])
     
@@ -948,7 +941,7 @@ def reminders_page(username):
     st.markdown("Regular breathing breaks reduce stress and anxiety")
     
     # Get existing settings
-    existing_breathing = reminders_col.find_one({"username": username, "type": "breathing"})
+    existing_breathing = reminders_repo.find_one({"username": username, "type": "breathing"}, ["enabled", "frequency"])
     
     col1, col2 = st.columns([2, 1])
     
@@ -1000,7 +993,7 @@ def reminders_page(username):
     st.markdown("Stay on track with regular goal reviews")
     
     # Get existing settings
-    existing_goal = reminders_col.find_one({"username": username, "type": "goal"})
+    existing_goal = reminders_repo.find_one({"username": username, "type": "goal"}, ["enabled", "frequency"])
     
     col1, col2 = st.columns([2, 1])
     
@@ -1050,7 +1043,9 @@ def reminders_page(username):
     st.markdown("---")
     st.subheader("📊 Your Reminder Summary")
     
-    all_reminders = list(reminders_col.find({"username": username}))
+    all_reminders = reminders_repo.find(
+        {"username": username}, ["type", "enabled", "time", "frequency", "updated_at"]
+    )
     
     if not all_reminders:
         st.info("🔕 No reminders set yet. Configure them above!")
@@ -10,6 +10,8 @@ import plotly.express as px
 import plotly.graph_objects as go
 
 from db import get_db
+from repositories import repository
+import daily_stats
 
 # -------------------- Database Connection --------------------
 db = get_db()
@@ -23,6 +25,12 @@ gratitude_jar_col = db["gratitude_jar"]
 worry_box_col = db["worry_box"]
 sessions_col = db["sessions"]  # For assessment data
 
+# Projected reads (see repositories.py)
+coping_plans_repo = repository(coping_plans_col)
+worry_box_repo = repository(worry_box_col)
+mood_board_repo = repository(mood_board_col)
+gratitude_jar_repo = repository(gratitude_jar_col)
+
 # -------------------- 🎯 PERSONALIZED COPING PLANS --------------------
 def coping_plans_page(username):
     st.title("🎯 Your Personalized Coping Plan")
@@ -42,18 +50,19 @@ def coping_plans_page(username):
 def generate_coping_plan(username):
     st.subheader("🔄 Generate Personalized Coping Plan")
     
-    # Get user's recent assessment data
-    recent_sessions = list(sessions_col.find(
-        {"username": username}
-    ).sort("timestamp", -1).limit(10))
+    # Emotion counts from the user's last week of chatting (daily rollup)
+    recent_days = daily_stats.days(db, username, ["emotions"], newest_first=True, limit=7, messages={"$gt": 0})
     
-    if not recent_sessions:
+    if not recent_days:
         st.info("💡 Chat with the bot first to generate a personalized plan based on your emotions!")
         return
     
     # Analyze user's patterns
-    emotions = [s.get('emotion', 'neutral') for s in recent_sessions]
-    most_common_emotion = max(set(emotions), key=emotions.count)
+    emotions = {}
+    for day in recent_days:
+        for emotion, count in day.get('emotions', {}).items():
+            emotions[emotion] = emotions.get(emotion, 0) + count
+    most_common_emotion = max(emotions, key=emotions.get) if emotions else "neutral"
     
     st.markdown(f"### Based on your recent patterns:")
     st.info(f"**Most Common Emotion:** {most_common_emotion.title()}")
@@ -244,10 +253,10 @@ def create_personalized_plan(username, emotion, focus_areas, intensity):
 def display_current_plan(username):
     """Display the user's active coping plan"""
     
-    plan_doc = coping_plans_col.find_one({
+    plan_doc = coping_plans_repo.find_one({
         "username": username,
         "active": True
-    }, sort=[("created_at", -1)])
+    }, ["plan", "created_at", "focus_areas", "intensity"], sort=[("created_at", -1)])
     
     if not plan_doc:
         st.info("📋 No active coping plan. Generate one in the 'Generate New Plan' tab!")
@@ -325,9 +334,12 @@ def display_current_plan(username):
 def view_all_plans(username):
     """View all historical coping plans"""
     
-    plans = list(coping_plans_col.find(
-        {"username": username}
-    ).sort("created_at", -1))
+    # The nested plan itself is only needed for the active plan
+    plans = coping_plans_repo.find(
+        {"username": username},
+        ["_id", "created_at", "intensity", "focus_areas", "emotion_pattern"],
+        sort=[("created_at", -1)]
+    )
     
     if not plans:
         st.info("📚 No plans yet. Generate your first one!")
@@ -1351,9 +1363,11 @@ def mood_board_tool(username):
     st.markdown("---")
     st.markdown("### 🖼️ Your Mood Board Gallery")
     
-    past_boards = list(mood_board_col.find(
-        {"username": username}
-    ).sort("timestamp", -1).limit(12))
+    past_boards = mood_board_repo.find(
+        {"username": username},
+        ["mood", "color", "words", "emojis", "timestamp"],
+        sort=[("timestamp", -1)], limit=12
+    )
     
     if past_boards:
         cols = st.columns(3)
@@ -1451,7 +1465,9 @@ def gratitude_jar_tool(username):
     if filter_category != "All":
         query["category"] = filter_category
     
-    gratitudes = list(gratitude_jar_col.find(query).sort("timestamp", -1).limit(20))
+    gratitudes = gratitude_jar_repo.find(
+        query, ["_id", "category", "text", "timestamp"], sort=[("timestamp", -1)], limit=20
+    )
     
     if gratitudes:
         for gratitude in gratitudes:
@@ -1559,10 +1575,10 @@ def worry_box_tool(username):
 def display_active_worries(username):
     st.markdown("### 📦 Your Active Worries")
     
-    worries = list(worry_box_col.find({
+    worries = worry_box_repo.find({
         "username": username,
         "status": "active"
-    }).sort("created_at", -1))
+    }, ["_id", "text", "intensity", "controllable", "created_at"], sort=[("created_at", -1)])
     
     if not worries:
         st.success("🎉 Your worry box is empty! That's great!")
@@ -1611,10 +1627,10 @@ def display_active_worries(username):
 def display_resolved_worries(username):
     st.markdown("### ✅ Resolved Worries")
     
-    resolved = list(worry_box_col.find({
+    resolved = worry_box_repo.find({
         "username": username,
         "status": "resolved"
-    }).sort("resolved_at", -1).limit(20))
+    }, ["text", "created_at", "resolved_at"], sort=[("resolved_at", -1)], limit=20)
     
     if not resolved:
         st.info("No resolved worries yet. Keep working through your active worries!")
@@ -1630,7 +1646,7 @@ def display_resolved_worries(username):
 def worry_insights(username):
     st.markdown("### 📊 Worry Patterns & Insights")
     
-    all_worries = list(worry_box_col.find({"username": username}))
+    all_worries = worry_box_repo.find({"username": username}, ["status", "intensity", "controllable"])
     
     if not all_worries:
         st.info("Start using the worry box to see insights!")
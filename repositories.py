@@ -0,0 +1,125 @@
+"""
+repositories.py
+Projection-aware read access to MongoDB collections
+
+Every read names the fields the page renders, so large parts of a document
+(a coping plan's nested `plan`, the base64 snapshots on old
+virtual_chat_sessions documents) never leave the server unless a page asks
+for them.
+
+Each repository also counts the documents and BSON bytes its reads return,
+per call and in total, so transfer_report() shows what every page costs.
+
+Usage:
+    worry_box = repository(db["worry_box"])
+    worries = worry_box.find({"username": u}, ["status", "intensity"])
+"""
+
+import threading
+import time
+
+import bson
+
+DEFAULT_BATCH_SIZE = 100
+
+_repositories = {}
+_repositories_lock = threading.Lock()
+
+
+class Repository:
+    """Reads from one collection with explicit projections, limits and batch sizes"""
+
+    def __init__(self, collection, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Args:
+            collection: pymongo Collection
+            batch_size: Documents per cursor batch when a call doesn't say
+        """
+        self.collection = collection
+        self.name = collection.name
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.documents = 0
+        self.bytes = 0
+        self.last_call = None
+
+    @staticmethod
+    def _projection(fields):
+        if not fields:
+            raise ValueError("Repository reads need an explicit list of fields")
+        projection = {field: 1 for field in fields}
+        # _id comes back unless excluded; only keep it when asked for
+        projection.setdefault("_id", 0)
+        return projection
+
+    def find(self, query, fields, sort=None, limit=0, batch_size=None):
+        """
+        Documents matching query, with only the given fields
+
+        Args:
+            query: MongoDB filter
+            fields: Field names to return (dotted paths allowed); include
+                "_id" to get it back
+            sort: List of (field, direction), or None
+            limit: Most documents to return, 0 for no limit
+            batch_size: Documents per round trip, defaults to the repository's
+
+        Returns:
+            List of documents
+        """
+        started = time.perf_counter()
+        cursor = self.collection.find(
+            query, self._projection(fields),
+            sort=sort, limit=limit, batch_size=batch_size or self.batch_size
+        )
+        docs = list(cursor)
+        self._record(docs, time.perf_counter() - started)
+        return docs
+
+    def find_one(self, query, fields, sort=None):
+        """First matching document with only the given fields, or None"""
+        docs = self.find(query, fields, sort=sort, limit=1, batch_size=1)
+        return docs[0] if docs else None
+
+    def count(self, query):
+        """Number of matching documents (no documents are transferred)"""
+        return self.collection.count_documents(query)
+
+    def _record(self, docs, elapsed):
+        size = sum(len(bson.encode(doc)) for doc in docs)
+        with self._lock:
+            self.calls += 1
+            self.documents += len(docs)
+            self.bytes += size
+            self.last_call = {'documents': len(docs), 'bytes': size, 'ms': elapsed * 1000}
+
+    def stats(self):
+        with self._lock:
+            last = self.last_call or {}
+            return {
+                'collection': self.name,
+                'calls': self.calls,
+                'documents': self.documents,
+                'bytes': self.bytes,
+                'avg_bytes_per_call': self.bytes / self.calls if self.calls else 0.0,
+                'last_call_bytes': last.get('bytes', 0),
+                'last_call_ms': last.get('ms', 0.0),
+            }
+
+
+def repository(collection):
+    """Shared Repository for a collection (one per collection per process)"""
+    key = collection.full_name
+    with _repositories_lock:
+        if key not in _repositories:
+            _repositories[key] = Repository(collection)
+        return _repositories[key]
+
+
+def transfer_report():
+    """Per-collection read statistics, most bytes first"""
+    with _repositories_lock:
+        repos = list(_repositories.values())
+    return sorted((repo.stats() for repo in repos), key=lambda row: row['bytes'], reverse=True)
@@ -0,0 +1,185 @@
+"""
+session_recorder.py
+Streaming persistence for virtual chat sessions
+
+Instead of one document holding a whole session (chat, emotion timeline
+and base64 snapshots), each chat turn and each emotion sample becomes its
+own small document, appended in batches while the session runs:
+
+    virtual_chat_sessions   one header per session (counters, snapshot ids)
+    virtual_chat_turns      one document per chat message
+    virtual_chat_emotions   one document per face emotion sample
+    snapshot_refs /         per-session snapshots, see snapshot_store.py
+    virtual_chat_snapshots
+
+A crash loses at most one flush interval, and no document grows with the
+length of the session except the header's list of snapshot ids.
+"""
+
+import datetime
+import time
+import uuid
+from collections import deque
+
+from pymongo.errors import BulkWriteError
+
+from snapshot_store import SnapshotStore
+
+
+class SessionRecorder:
+    """Buffers one session's turns and samples and writes them in batches"""
+
+    def __init__(self, db, username, session_id=None, flush_interval=5.0,
+                 flush_size=50, max_buffer=1000):
+        """
+        Args:
+            db: pymongo Database
+            username: Owner of the session
+            session_id: Existing session to append to, or None for a new one
+            flush_interval: Seconds between writes while there is buffered data
+            flush_size: Buffered items that trigger a write right away
+            max_buffer: Most items kept while the database is unreachable;
+                the oldest are dropped beyond that
+        """
+        self.db = db
+        self.sessions_col = db["virtual_chat_sessions"]
+        self.turns_col = db["virtual_chat_turns"]
+        self.emotions_col = db["virtual_chat_emotions"]
+        self.snapshots = SnapshotStore(db)
+
+        self.username = username
+        self.session_id = session_id or uuid.uuid4().hex
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+
+        self._turns = deque(maxlen=max_buffer)
+        self._samples = deque(maxlen=max_buffer)
+        self._turn_seq = 0
+        self._sample_seq = 0
+        self._last_flush = time.monotonic()
+        self._header_written = False
+        self.snapshot_count = 0
+        self.dropped = 0
+        self.closed = False
+
+    # ==================== RECORDING ====================
+
+    def _buffer(self, queue, doc):
+        if len(queue) == queue.maxlen:
+            self.dropped += 1
+        queue.append(doc)
+
+    def add_turn(self, role, content, emotion=None):
+        """Record one chat message"""
+        self._turn_seq += 1
+        self._buffer(self._turns, {
+            "_id": f"{self.session_id}:t{self._turn_seq}",
+            "session_id": self.session_id,
+            "username": self.username,
+            "seq": self._turn_seq,
+            "role": role,
+            "content": content,
+            "emotion": emotion,
+            "timestamp": datetime.datetime.utcnow(),
+        })
+        self.maybe_flush()
+
+    def add_sample(self, emotion, confidence, timestamp=None):
+        """Record one face emotion reading"""
+        self._sample_seq += 1
+        self._buffer(self._samples, {
+            "_id": f"{self.session_id}:e{self._sample_seq}",
+            "session_id": self.session_id,
+            "username": self.username,
+            "seq": self._sample_seq,
+            "emotion": emotion,
+            "confidence": confidence,
+            "timestamp": timestamp or datetime.datetime.utcnow(),
+        })
+        self.maybe_flush()
+
+    def add_snapshot(self, frame):
+        """
+        Store a BGR frame for this session and reference it from the header
+
+        Returns:
+            The snapshot's content hash
+        """
+        digest, created = self.snapshots.save(self.username, self.session_id, frame)
+        self._write_header({"$addToSet": {"snapshots": digest}})
+        if created:
+            self.snapshot_count += 1
+        return digest
+
+    # ==================== WRITING ====================
+
+    def pending(self):
+        return len(self._turns) + len(self._samples)
+
+    def maybe_flush(self):
+        """Write if the buffer is full enough or the flush interval passed"""
+        if self.pending() == 0:
+            return True
+        if self.pending() >= self.flush_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            return self.flush()
+        return True
+
+    def flush(self):
+        """
+        Append everything buffered; on failure the data stays buffered
+
+        Returns:
+            True if the buffer was written
+        """
+        self._last_flush = time.monotonic()
+        turns, samples = list(self._turns), list(self._samples)
+        if not turns and not samples and self._header_written:
+            return True
+
+        try:
+            _append(self.turns_col, turns)
+            _append(self.emotions_col, samples)
+            self._write_header({"$set": {
+                "total_messages": self._turn_seq,
+                "session_duration_emotions": self._sample_seq,
+            }})
+        except Exception as e:
+            print(f"⚠️ Could not save virtual chat batch ({self.pending()} buffered): {e}")
+            return False
+
+        for _ in turns:
+            self._turns.popleft()
+        for _ in samples:
+            self._samples.popleft()
+        return True
+
+    def _write_header(self, update):
+        now = datetime.datetime.utcnow()
+        update.setdefault("$set", {})["last_active"] = now
+        update["$setOnInsert"] = {"username": self.username, "timestamp": now}
+        self.sessions_col.update_one({"session_id": self.session_id}, update, upsert=True)
+        self._header_written = True
+
+    def close(self):
+        """Flush what is left and mark the session as ended"""
+        ok = self.flush()
+        if ok:
+            try:
+                self._write_header({"$set": {"ended_at": datetime.datetime.utcnow()}})
+            except Exception as e:
+                print(f"⚠️ Could not close virtual chat session: {e}")
+                ok = False
+        self.closed = True
+        return ok
+
+
+def _append(collection, docs):
+    """insert_many that tolerates documents already written by a failed earlier try"""
+    if not docs:
+        return
+    try:
+        collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        # _id is session + sequence number, so a duplicate is a retried write
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
@@ -0,0 +1,97 @@
+"""
+snapshot_store.py
+Per-user, per-session camera snapshots with content-hash deduplication
+
+    virtual_chat_snapshots  GridFS bucket: one JPEG per distinct image,
+                            _id = SHA-256 of the bytes
+    snapshot_refs           one small document per (user, session, image)
+                            with a thumbnail for listing
+
+Images are only reachable through a user's own references, so one user
+never sees another's snapshots, and identical images are stored once.
+"""
+
+import datetime
+import hashlib
+
+from bson.binary import Binary
+
+THUMBNAIL_WIDTH = 160
+
+
+class SnapshotStore:
+    """Stores camera frames once by content hash and indexes them per user/session"""
+
+    def __init__(self, db, bucket="virtual_chat_snapshots", thumbnail_width=THUMBNAIL_WIDTH):
+        import gridfs
+
+        self.fs = gridfs.GridFS(db, collection=bucket)
+        self.refs_col = db["snapshot_refs"]
+        self.thumbnail_width = thumbnail_width
+
+    def _encode(self, frame):
+        import cv2
+
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        if not ok:
+            raise ValueError("Could not encode snapshot")
+
+        h, w = frame.shape[:2]
+        thumb_h = max(1, round(h * self.thumbnail_width / w))
+        thumb = cv2.resize(frame, (self.thumbnail_width, thumb_h), interpolation=cv2.INTER_AREA)
+        _, thumb_jpeg = cv2.imencode(".jpg", thumb, [cv2.IMWRITE_JPEG_QUALITY, 70])
+        return jpeg.tobytes(), thumb_jpeg.tobytes(), (w, h)
+
+    def save(self, username, session_id, frame):
+        """
+        Store a BGR frame for a user's session
+
+        Returns:
+            (digest, created): the image's content hash (the same frame saved
+            twice is one image) and whether this session had no reference to
+            it yet
+        """
+        from gridfs.errors import FileExists
+
+        jpeg, thumbnail, (width, height) = self._encode(frame)
+        digest = hashlib.sha256(jpeg).hexdigest()
+
+        # The unique _id makes the insert the existence check, so two sessions
+        # saving the same image at once cannot both store it
+        try:
+            self.fs.put(jpeg, _id=digest, content_type="image/jpeg")
+        except FileExists:
+            pass
+
+        result = self.refs_col.update_one(
+            {"_id": f"{username}:{session_id}:{digest}"},
+            {"$setOnInsert": {
+                "username": username,
+                "session_id": session_id,
+                "digest": digest,
+                "thumbnail": Binary(thumbnail),
+                "width": width,
+                "height": height,
+                "created_at": datetime.datetime.utcnow(),
+            }},
+            upsert=True
+        )
+        return digest, result.upserted_id is not None
+
+    def list(self, username, session_id=None, limit=50):
+        """Newest snapshot references (with thumbnails) for a user or one session"""
+        query = {"username": username}
+        if session_id is not None:
+            query["session_id"] = session_id
+        return list(self.refs_col.find(query).sort("created_at", -1).limit(limit))
+
+    def load(self, username, digest):
+        """
+        Full JPEG bytes, only if this user has a reference to the image
+
+        Returns:
+            bytes, or None
+        """
+        if self.refs_col.find_one({"username": username, "digest": digest}, {"_id": 1}) is None:
+            return None
+        return self.fs.get(digest).read()
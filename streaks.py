@@ -0,0 +1,187 @@
+"""
+streaks.py
+Per-user streak state updated on each qualifying write
+
+    user_streaks    one document per (user, kind)
+        _id             "username:kind" (kind is "login" or "journal")
+        current         consecutive local days up to last_date
+        longest         best streak so far
+        last_date       last qualifying local day, "YYYY-MM-DD"
+
+record() advances the streak with a single pipeline update, so two writes
+racing on the same day can't both count it, and get() is one _id lookup
+however long the user's history is. Days are the user's local days in
+their IANA timezone (users.timezone, else MINDSYNC_TIMEZONE, else UTC).
+
+Usage (seed streaks for existing users from user_daily_stats):
+    python streaks.py --uri mongodb://localhost:27017
+"""
+
+import argparse
+import datetime
+import os
+import sys
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from pymongo import ReturnDocument
+
+COLLECTION = "user_streaks"
+DB_NAME = "final_chatbot_talks"
+DEFAULT_TIMEZONE = os.environ.get("MINDSYNC_TIMEZONE", "UTC")
+
+KINDS = ("login", "journal")
+
+
+def _zone(tz):
+    try:
+        return ZoneInfo(tz or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        print(f"⚠️ Unknown timezone {tz!r}, using UTC")
+        return datetime.timezone.utc
+
+
+def local_date(timestamp=None, tz=DEFAULT_TIMEZONE):
+    """
+    The user's local calendar day for a timestamp
+
+    Args:
+        timestamp: Naive UTC datetime (as stored by the app), aware
+            datetime, or None for now
+        tz: IANA timezone name
+
+    Returns:
+        datetime.date
+    """
+    if timestamp is None:
+        timestamp = datetime.datetime.now(datetime.timezone.utc)
+    elif timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+    return timestamp.astimezone(_zone(tz)).date()
+
+
+def _advance(username, kind, today, yesterday):
+    """Update pipeline moving a streak forward to today"""
+    return [
+        {"$set": {
+            "current": {"$switch": {
+                "branches": [
+                    # Already counted today (or a write from an earlier day)
+                    {"case": {"$gte": ["$last_date", today]}, "then": "$current"},
+                    {"case": {"$eq": ["$last_date", yesterday]}, "then": {"$add": ["$current", 1]}},
+                ],
+                "default": 1,
+            }},
+        }},
+        {"$set": {
+            "longest": {"$max": ["$longest", "$current"]},
+            "last_date": {"$max": ["$last_date", today]},
+            "username": {"$literal": username},
+            "kind": kind,
+        }},
+    ]
+
+
+def record(db, username, kind, timestamp=None, tz=DEFAULT_TIMEZONE):
+    """
+    Count a qualifying activity for the user's local day
+
+    Returns:
+        The updated streak document
+    """
+    today = local_date(timestamp, tz)
+    yesterday = today - datetime.timedelta(days=1)
+    try:
+        return db[COLLECTION].find_one_and_update(
+            {"_id": f"{username}:{kind}"},
+            _advance(username, kind, today.isoformat(), yesterday.isoformat()),
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except Exception as e:
+        print(f"⚠️ Could not update {kind} streak for {username}: {e}")
+        return None
+
+
+def get(db, username, kind, tz=DEFAULT_TIMEZONE):
+    """
+    Streak as of today: a streak whose last day is before yesterday is broken
+
+    Returns:
+        {'current': int, 'longest': int, 'last_date': "YYYY-MM-DD" or None}
+    """
+    doc = db[COLLECTION].find_one({"_id": f"{username}:{kind}"}, {"_id": 0, "current": 1, "longest": 1, "last_date": 1})
+    if doc is None:
+        return {'current': 0, 'longest': 0, 'last_date': None}
+
+    yesterday = (local_date(None, tz) - datetime.timedelta(days=1)).isoformat()
+    alive = doc.get("last_date") is not None and doc["last_date"] >= yesterday
+    return {
+        'current': doc.get("current", 0) if alive else 0,
+        'longest': doc.get("longest", 0),
+        'last_date': doc.get("last_date"),
+    }
+
+
+# ==================== SEEDING ====================
+
+def _from_dates(dates):
+    """(current, longest) for ascending ISO dates, current ending at the last one"""
+    current = longest = 0
+    previous = None
+    for date in dates:
+        day = datetime.date.fromisoformat(date)
+        current = current + 1 if previous is not None and (day - previous).days == 1 else 1
+        longest = max(longest, current)
+        previous = day
+    return current, longest
+
+
+def seed(db, username=None):
+    """
+    Build streak state from the user_daily_stats rollup
+
+    The rollup is kept in UTC days, so seeded streaks use UTC; new writes
+    continue them in each user's own timezone.
+
+    Returns:
+        Number of streak documents written
+    """
+    from daily_stats import COLLECTION as DAILY
+
+    conditions = {"login": {"messages": {"$gt": 0}}, "journal": {"journal": True}}
+    users = [username] if username else db[DAILY].distinct("username")
+    written = 0
+    for user in users:
+        for kind in KINDS:
+            dates = [row["date"] for row in db[DAILY].find(
+                {"username": user, **conditions[kind]}, {"_id": 0, "date": 1}, sort=[("date", 1)]
+            )]
+            if not dates:
+                continue
+            current, longest = _from_dates(dates)
+            db[COLLECTION].replace_one(
+                {"_id": f"{user}:{kind}"},
+                {"username": user, "kind": kind, "current": current, "longest": longest, "last_date": dates[-1]},
+                upsert=True
+            )
+            written += 1
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed user_streaks from the user_daily_stats rollup")
+    parser.add_argument("--uri", default="mongodb://localhost:27017", help="MongoDB connection string")
+    parser.add_argument("--db", default=DB_NAME, help="Database name")
+    parser.add_argument("--user", default=None, help="Only seed this user's streaks")
+    args = parser.parse_args(argv)
+
+    from pymongo import MongoClient
+    db = MongoClient(args.uri, serverSelectionTimeoutMS=5000)[args.db]
+
+    written = seed(db, args.user)
+    print(f"✅ Wrote {written} streak documents to {COLLECTION}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
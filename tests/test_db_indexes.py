@@ -0,0 +1,115 @@
+"""
+Tests for the index bootstrap and the hot-query plan check
+
+The explain test needs a running mongod (MONGODB_URI, default
+mongodb://localhost:27017) and is skipped without one.
+
+Run with:
+    python -m pytest tests
+"""
+
+import datetime
+import os
+import sys
+import uuid
+
+import pytest
+from pymongo import ASCENDING, DESCENDING
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from db_indexes import HOT_QUERIES, INDEXES, _index_stages, check_hot_queries, ensure_indexes  # noqa: E402
+
+MONGODB_URI = os.environ.get("MONGODB_URI", "mongodb://localhost:27017")
+
+
+def seed(db):
+    """A few documents per collection, so the planner has something to plan"""
+    now = datetime.datetime.utcnow()
+    for name in {collection for collection, _, _ in HOT_QUERIES}:
+        db[name].insert_many([
+            {"username": f"user{i}", "session_id": f"s{i}", "seq": i, "timestamp": now,
+             "created_at": now, "date": "2024-01-01", "status": "active"}
+            for i in range(20)
+        ])
+
+
+# ==================== STATIC PLANNER ====================
+
+@pytest.mark.parametrize("keys, query, sort, expected", [
+    ([("username", 1)], {"status": "active"}, None, None),
+    ([("username", 1), ("timestamp", -1)], {"username": "u"}, [("timestamp", -1)], ["FETCH", "IXSCAN"]),
+    ([("username", 1), ("timestamp", -1)], {"username": "u"}, [("timestamp", 1)], ["FETCH", "IXSCAN"]),
+    ([("username", 1)], {"username": "u"}, [("timestamp", -1)], ["SORT", "FETCH", "IXSCAN"]),
+    # A range on the key before the sort field breaks the index order
+    ([("username", 1), ("status", 1), ("created_at", -1)],
+     {"username": "u", "status": {"$in": ["a", "b"]}}, [("created_at", -1)], ["SORT", "FETCH", "IXSCAN"]),
+    # An unfiltered key between the equality prefix and the sort field
+    ([("username", 1), ("status", 1), ("created_at", -1)],
+     {"username": "u"}, [("created_at", -1)], ["SORT", "FETCH", "IXSCAN"]),
+    ([("a", 1), ("b", 1)], {"x": 1}, [("a", 1), ("b", -1)], ["SORT", "FETCH", "IXSCAN"]),
+])
+def test_index_stages(keys, query, sort, expected):
+    assert _index_stages(keys, query, sort) == expected
+
+
+def test_static_check_flags_queries_without_matching_indexes():
+    mongomock = pytest.importorskip("mongomock")
+    db = mongomock.MongoClient().db
+
+    # No indexes: every hot query scans
+    assert len(check_hot_queries(db, use_explain=False)) == len(HOT_QUERIES)
+
+    # username-only indexes: every sorted query sorts in memory
+    for name in INDEXES:
+        db[name].create_index([("username", ASCENDING)])
+    problems = check_hot_queries(db, use_explain=False)
+    assert {(c, str(q)) for c, q, _ in problems} >= {
+        (c, str(q)) for c, q, sort in HOT_QUERIES if sort and "username" in q
+    }
+
+    ensure_indexes(db)
+    assert check_hot_queries(db, use_explain=False) == []
+
+
+def test_static_check_prefers_the_index_that_provides_the_sort():
+    mongomock = pytest.importorskip("mongomock")
+    db = mongomock.MongoClient().db
+    db.worry_box.create_index([("username", ASCENDING), ("status", ASCENDING)])
+    db.worry_box.create_index([("username", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)])
+
+    problems = check_hot_queries(db, use_explain=False)
+    assert ("worry_box", {"username": "u", "status": "active"}) not in [(c, q) for c, q, _ in problems]
+
+
+# ==================== EXPLAIN (real mongod) ====================
+
+@pytest.fixture
+def mongo_db():
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"No MongoDB server at {MONGODB_URI}")
+
+    name = f"mindsync_index_test_{uuid.uuid4().hex[:8]}"
+    try:
+        yield client[name]
+    finally:
+        client.drop_database(name)
+        client.close()
+
+
+def test_explain_finds_scans_before_and_none_after_ensure_indexes(mongo_db):
+    seed(mongo_db)
+
+    before = check_hot_queries(mongo_db)
+    assert before, "hot queries should scan or sort before any index exists"
+    assert any("COLLSCAN" in stages for _, _, stages in before)
+
+    assert ensure_indexes(mongo_db) == 0
+    assert check_hot_queries(mongo_db) == []
@@ -0,0 +1,94 @@
+"""
+Tests for the shared face emotion pool
+
+Run with:
+    python -m pytest tests
+"""
+
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from face_emotion import FaceEmotionPool  # noqa: E402
+
+
+class GatedAnalyzer:
+    """Stand-in for FaceEmotionAnalyzer that holds each batch until released"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def analyze_batch(self, frames, regions):
+        self.started.set()
+        self.release.wait(5)
+        return [{'dominant_emotion': "happy", 'confidence': 0.9} for _ in frames]
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def frame():
+    return np.zeros((48, 48, 3), dtype=np.uint8)
+
+
+def test_result_is_kept_for_a_live_client():
+    analyzer = GatedAnalyzer()
+    analyzer.release.set()
+    pool = FaceEmotionPool(analyzer)
+    try:
+        pool.submit("a", frame())
+        assert wait_until(lambda: pool.stats()['processed'] == 1)
+        assert pool.take_result("a")['dominant_emotion'] == "happy"
+        assert pool.take_result("a") is None
+    finally:
+        pool.close()
+
+
+def test_result_of_a_forgotten_client_is_dropped():
+    analyzer = GatedAnalyzer()
+    pool = FaceEmotionPool(analyzer)
+    try:
+        pool.submit("a", frame())
+        assert analyzer.started.wait(5)
+
+        # Camera stopped while the frame was being analyzed
+        pool.forget("a")
+        analyzer.release.set()
+
+        assert wait_until(lambda: pool.stats()['processed'] == 1)
+        assert pool.take_result("a") is None
+        assert pool._results == {}
+        assert pool.stats()['dropped'] == 1
+        assert pool.stats()['clients'] == 0
+    finally:
+        pool.close()
+
+
+def test_abandoned_client_results_are_dropped():
+    analyzer = GatedAnalyzer()
+    analyzer.release.set()
+    pool = FaceEmotionPool(analyzer, client_ttl=0.05)
+    try:
+        # Session went away without calling forget(): its result is never collected
+        pool.submit("gone", frame())
+        assert wait_until(lambda: pool.stats()['processed'] == 1)
+        time.sleep(0.1)
+
+        # The next completed batch clears it out
+        pool.submit("live", frame())
+        assert wait_until(lambda: pool.stats()['processed'] == 2)
+        assert set(pool._results) == {"live"}
+        assert pool.stats()['clients'] == 1
+    finally:
+        pool.close()
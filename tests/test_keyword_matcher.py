@@ -0,0 +1,187 @@
+"""
+Consistency tests for the single-pass emotion matchers
+
+detect_emotion_from_text and detect_basic_emotion must return the same
+(emotion, confidence) as the substring cascades they replaced. Both
+originals are copied verbatim below, so this compares against the real
+baseline rather than a re-implementation of the new matcher.
+
+Run with:
+    python -m pytest tests
+"""
+
+import glob
+import json
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from chatbot_reponses import (  # noqa: E402
+    BASIC_EMOTION_KEYWORDS,
+    EMOTION_RULES,
+    KEYWORD_MAPPINGS,
+    SubstringMatcher,
+    detect_basic_emotion,
+    detect_emotion_from_text,
+    match_emotion_groups,
+)
+
+
+# ==================== BASELINE CASCADES (verbatim) ====================
+
+def baseline_detect_emotion_from_text(text):
+    """Enhanced emotion detection"""
+    text_lower = text.lower()
+
+    # Crisis (highest priority)
+    if any(word in text_lower for word in KEYWORD_MAPPINGS["crisis"]):
+        return "fear", 0.95
+
+    # Severe depression
+    if any(word in text_lower for word in KEYWORD_MAPPINGS["severe_depression"]):
+        return "sadness", 0.95
+
+    # Strong negative emotions
+    if any(word in text_lower for word in KEYWORD_MAPPINGS["anger"]):
+        return "anger", 0.9
+
+    # Fear/Anxiety
+    if any(word in text_lower for word in KEYWORD_MAPPINGS["anxiety"]):
+        return "fear", 0.85
+
+    # Sadness
+    if any(word in text_lower for word in KEYWORD_MAPPINGS["sadness"]):
+        return "sadness", 0.85
+
+    # Joy/Happiness
+    if any(word in text_lower for word in KEYWORD_MAPPINGS["happiness"]):
+        return "joy", 0.9
+
+    # Success
+    if any(word in text_lower for word in KEYWORD_MAPPINGS["success"]):
+        return "joy", 0.85
+
+    # Default neutral
+    return "neutral", 0.5
+
+
+def baseline_detect_text_emotion(text: str):
+    """Detect emotion from text based on keywords in generate_contextual_response"""
+    text = text.lower()
+
+    # Match keywords to emotion
+    if any(word in text for word in ["happy", "joy", "excited", "happiness", "amazing", "awesome"]):
+        return "joy", 0.9
+    elif any(word in text for word in ["sad", "sadness", "down", "cry", "tired"]):
+        return "sadness", 0.9
+    elif any(word in text for word in ["angry", "frustrated", "mad", "furious"]):
+        return "anger", 0.9
+    elif any(word in text for word in ["fear", "afraid", "scared", "panic"]):
+        return "fear", 0.9
+    elif any(word in text for word in ["surprise", "amazed", "wow", "shocked"]):
+        return "surprise", 0.9
+    else:
+        return "neutral", 0.5
+
+
+# ==================== CORPUS ====================
+
+SAMPLE_MESSAGES = [
+    "hi",
+    "",
+    "nothing much",
+    "I'm so stressed about my exams tomorrow",
+    "my friends and I watched a movie after school",
+    "I got promoted at work today and I'm so happy!",
+    "the crusade in history class was boring",
+    "I want to kill myself",
+    "I feel hopeless and sad",
+    "I'm furious and anxious",
+    "panic attack before my exam",
+    "I feel panicky right now",
+    "this week has been so stressful",
+    "my chest is hurting and I can't breathe",
+    "I'm so thankful for my family",
+    "I made a new friend at school today",
+    "wow I'm shocked",
+    "so tired and down today",
+    "I got accepted!",
+    "HAPPY BIRTHDAY TO ME",
+    "Sadness is all I feel",
+]
+
+
+def knowledge_base_inputs():
+    inputs = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "rag_knowledges", "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            inputs.extend(item.get("user_input", "") for item in json.load(f))
+    return inputs
+
+
+def keyword_variants():
+    """Every emotion keyword alone, inside a longer word, and in a sentence"""
+    keywords = {k for group, _, _ in EMOTION_RULES for k in KEYWORD_MAPPINGS[group]}
+    keywords |= {k for words in BASIC_EMOTION_KEYWORDS.values() for k in words}
+    variants = []
+    for keyword in sorted(keywords):
+        variants += [keyword, f"un{keyword}ly", f"Today I felt {keyword.upper()} again."]
+    return variants
+
+
+def random_mixes(n=500, seed=7):
+    """Random messages mixing keywords from several groups with filler words"""
+    rng = random.Random(seed)
+    keywords = sorted({k for words in KEYWORD_MAPPINGS.values() for k in words}
+                      | {k for words in BASIC_EMOTION_KEYWORDS.values() for k in words})
+    filler = ["today", "really", "my", "friend", "and", "the", "school", "but", "so", "made"]
+    return [
+        " ".join(rng.choice(keywords if rng.random() < 0.3 else filler) for _ in range(rng.randint(1, 12)))
+        for _ in range(n)
+    ]
+
+
+CORPUS = list(dict.fromkeys(SAMPLE_MESSAGES + knowledge_base_inputs() + keyword_variants() + random_mixes()))
+
+
+# ==================== TESTS ====================
+
+def test_corpus_covers_knowledge_base():
+    assert len(knowledge_base_inputs()) > 0
+
+
+@pytest.mark.parametrize("text", CORPUS)
+def test_detect_emotion_from_text_matches_baseline(text):
+    assert detect_emotion_from_text(text) == baseline_detect_emotion_from_text(text)
+
+
+@pytest.mark.parametrize("text", CORPUS)
+def test_detect_basic_emotion_matches_baseline(text):
+    assert detect_basic_emotion(text) == baseline_detect_text_emotion(text)
+
+
+def test_precomputed_groups_give_same_results():
+    for text in SAMPLE_MESSAGES:
+        groups = match_emotion_groups(text)
+        assert detect_emotion_from_text(text, groups) == detect_emotion_from_text(text)
+        assert detect_basic_emotion(text, groups) == detect_basic_emotion(text)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("I feel panicky right now", ("fear", 0.85)),
+    ("I made a new friend at school today", ("anger", 0.9)),  # "mad" in "made", as before
+])
+def test_stems_keep_matching(text, expected):
+    assert detect_emotion_from_text(text) == expected
+
+
+def test_substring_matcher_reports_overlapping_keywords():
+    matcher = SubstringMatcher({"long": ["sadness"], "short": ["sad"], "inner": ["dne"], "other": ["xyz"]})
+    assert matcher.match("such sadness") == ["long", "short", "inner"]
+    assert matcher.first("so sad") == "short"
+    assert matcher.first("") is None
@@ -0,0 +1,53 @@
+"""
+Tests for the lazy model registry
+
+Run with:
+    python -m pytest tests
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+pytest.importorskip("streamlit")
+
+from model_registry import DEFAULT_WARMUP, FAILED, READY, ModelRegistry  # noqa: E402
+
+
+def wait_for(registry, name, timeout=5.0):
+    deadline = time.time() + timeout
+    while registry.status()[name] not in (READY, FAILED) and time.time() < deadline:
+        time.sleep(0.01)
+    return registry.status()[name]
+
+
+def test_default_warmup_skips_tensorflow_and_transformers():
+    assert DEFAULT_WARMUP.split(",") == ["rag"]
+
+
+def test_failed_model_reports_its_error():
+    registry = ModelRegistry()
+
+    def broken():
+        raise ImportError("No module named 'deepface'")
+
+    registry.register("face_emotion", broken)
+    assert registry.get_if_ready("face_emotion") is None
+    assert wait_for(registry, "face_emotion") == FAILED
+
+    assert registry.get_if_ready("face_emotion") is None
+    assert registry.error("face_emotion") == "No module named 'deepface'"
+
+
+def test_loading_and_ready_models_have_no_error():
+    registry = ModelRegistry()
+    registry.register("rag", lambda: "index")
+    assert registry.error("rag") is None
+
+    assert registry.get("rag") == "index"
+    assert registry.error("rag") is None
@@ -0,0 +1,123 @@
+"""
+Tests for the calibrated RAG confidence threshold
+
+The threshold written by calibrate_rag.py is one of the confidences the
+calibrated mapping produces, so a hit scoring exactly the threshold must be
+accepted by the app.
+
+Run with:
+    python -m pytest tests
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from calibrate_rag import fit_calibration, held_out_scores  # noqa: E402
+from enhanced_rag_system import EnhancedRAGSystem, get_enhanced_response  # noqa: E402
+
+MODEL = "all-MiniLM-L6-v2"
+
+
+def calibrated_rag(tmp_path, calibration):
+    path = tmp_path / "rag_calibration.json"
+    setup = {'model': MODEL, 'metric': "ip", 'fp16': True, 'index_type': "flat"}
+    path.write_text(json.dumps({**calibration, **setup}), encoding="utf-8")
+    return EnhancedRAGSystem(
+        rag_directory=str(tmp_path / "no_knowledge"),
+        model_name=MODEL,
+        cache_dir=None,
+        metric="ip",
+        fp16=True,
+        calibration_path=str(path),
+        build=False
+    )
+
+
+def synthetic_scores(n=400, seed=3):
+    """Raw cosine scores where higher scores are more often correct"""
+    rng = np.random.default_rng(seed)
+    raw = rng.uniform(0.2, 0.95, size=n)
+    correct = rng.uniform(size=n) < raw
+    return raw, correct
+
+
+def test_threshold_is_a_runtime_confidence(tmp_path):
+    raw, correct = synthetic_scores()
+    calibration = fit_calibration(raw, correct, target_precision=0.8)
+    assert calibration['threshold'] is not None
+
+    rag = calibrated_rag(tmp_path, calibration)
+    threshold = rag.confidence_threshold(0.6)
+    runtime = np.array([rag._calculate_confidence(score) for score in raw])
+
+    # The app accepts exactly the hits the calibration counted as accepted
+    assert np.isclose(runtime, threshold, rtol=0, atol=0).any()
+    assert (runtime >= threshold).mean() == pytest.approx(calibration['accept_rate'])
+
+
+def test_confidence_equal_to_threshold_is_accepted(tmp_path, monkeypatch):
+    rag = calibrated_rag(tmp_path, {'raw': [0.3, 0.9], 'precision': [0.4, 0.9], 'threshold': 0.9})
+    hit = {'combined': "from the knowledge base", 'confidence': 0.9}
+    monkeypatch.setattr(rag, "retrieve_response", lambda query, emotion=None, top_k=3: hit)
+
+    assert get_enhanced_response("I passed my exam", "joy", rag) == "from the knowledge base"
+
+    hit['confidence'] = 0.899999
+    assert get_enhanced_response("I passed my exam", "joy", rag) != "from the knowledge base"
+
+
+class HashingEmbedder:
+    """Bag-of-words stand-in for SentenceTransformer (no model download)"""
+
+    def encode(self, texts, convert_to_numpy=True, batch_size=32):
+        vectors = np.zeros((len(texts), 128), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"[a-z']+", text.lower()):
+                vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % 128] += 1
+        return vectors + 1e-3
+
+
+def test_held_out_scores_use_the_app_retrieval_path(monkeypatch):
+    pytest.importorskip("faiss")
+    rag = EnhancedRAGSystem(
+        rag_directory=os.path.join(ROOT, "rag_knowledges"),
+        model_name=MODEL,
+        cache_dir=None,
+        metric="ip",
+        fp16=True,
+        build=False,
+        query_cache_size=0
+    )
+    rag.embedder = HashingEmbedder()
+    full_kb = list(rag.knowledge_base)
+
+    routed = []
+    search = rag._search
+    monkeypatch.setattr(rag, "_search", lambda q, category, k: routed.append(category) or search(q, category, k))
+
+    raw, correct = held_out_scores(rag, holdout=0.2, seed=1, detect_emotion=lambda text: "sadness")
+
+    # Built from the training entries, with the app's settings and partitions
+    held = {item['user_input'] for item in full_kb} - {item['user_input'] for item in rag.knowledge_base}
+    assert len(held) == int(len({item['user_input'] for item in full_kb}) * 0.2)
+    assert type(rag.index).__name__ == "IndexScalarQuantizer"
+    assert set(rag.partitions) == {item['emotion_category'] for item in full_kb}
+
+    # Every query went to the partition its emotion routes to
+    assert routed == ["sadness"]
+    assert len(raw) == len(held)
+
+    # Correct means the same answer, which a wrong-category partition never has
+    answers = {item['user_input']: item['combined_response'] for item in full_kb}
+    sadness_answers = {item['combined_response'] for item in full_kb if item['emotion_category'] == "sadness"}
+    possible = sum(answers[text] in sadness_answers for text in held)
+    assert correct.sum() <= possible < len(held)
@@ -0,0 +1,70 @@
+"""
+Tests for deduplicated session snapshots
+
+Run with:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+pytest.importorskip("cv2")
+mongomock = pytest.importorskip("mongomock")
+import mongomock.gridfs  # noqa: E402
+
+from session_recorder import SessionRecorder  # noqa: E402
+from snapshot_store import SnapshotStore  # noqa: E402
+
+mongomock.gridfs.enable_gridfs_integration()
+
+
+def frame(value=0):
+    image = np.zeros((120, 160, 3), dtype=np.uint8)
+    image[:, :, 1] = value
+    return image
+
+
+def test_same_image_is_stored_once():
+    db = mongomock.MongoClient().db
+    store = SnapshotStore(db)
+
+    digest, created = store.save("alice", "s1", frame())
+    assert created
+    assert store.save("alice", "s1", frame()) == (digest, False)
+    assert store.save("alice", "s2", frame()) == (digest, True)
+    assert store.save("bob", "s3", frame()) == (digest, True)
+
+    assert db["virtual_chat_snapshots.files"].count_documents({}) == 1
+    assert db["snapshot_refs"].count_documents({}) == 3
+    assert store.load("alice", digest) == store.load("bob", digest)
+    assert store.load("carol", digest) is None
+
+
+def test_image_already_in_the_bucket_is_not_put_again():
+    db = mongomock.MongoClient().db
+    store = SnapshotStore(db)
+    digest, _ = store.save("alice", "s1", frame())
+
+    # Another session stored it between our hash and our insert
+    db["snapshot_refs"].delete_many({})
+    assert store.save("bob", "s2", frame()) == (digest, True)
+    assert db["virtual_chat_snapshots.files"].count_documents({}) == 1
+
+
+def test_recorder_counts_only_new_snapshots():
+    db = mongomock.MongoClient().db
+    recorder = SessionRecorder(db, "alice")
+
+    first = recorder.add_snapshot(frame())
+    assert recorder.add_snapshot(frame()) == first
+    recorder.add_snapshot(frame(200))
+
+    assert recorder.snapshot_count == 2
+    header = db["virtual_chat_sessions"].find_one({"session_id": recorder.session_id})
+    assert len(header["snapshots"]) == 2